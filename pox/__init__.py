@@ -24,11 +24,14 @@ except: # pragma: no cover
 
 
 from .shutils import shelltype, homedir, rootdir, username, sep, \
-                     minpath, env, whereis, which, find, walk, where, \
-                     mkdir, rmtree, shellsub
+                     minpath, env, whereis, which, find, walk, iwalk, where, \
+                     mkdir, rmtree, rmtree_wait, shellsub, shellrun
 from .utils import pattern, expandvars, getvars, convert, replace, select, \
                    findpackage, wait_for, disk_used, remote, which_python, \
-                   parse_remote, kbytes, selectdict, index_slice, index_join
+                   parse_remote, kbytes, selectdict, index_slice, index_join, \
+                   wait_for_all, iwait_for, CacheDir, replace_files, \
+                   expandvars_all, SequenceIndex, index_join_file, \
+                   pythons
 
 
 def license():
@@ -18,30 +18,104 @@ Disk management utilities.
 import os
 import shutil
 import sys
+import threading
 import time
 
 
-def disk_used(path):
+def _usage(stat):
+    """get the disk usage (in bytes) from the result of ``os.stat``"""
+    if hasattr(stat, 'st_blocks'):
+        return stat.st_blocks * 512
+    # on some platform st_blocks is not available (e.g., Windows)
+    # approximate by rounding to next multiple of 512
+    return (stat.st_size // 512 + 1) * 512
+
+
+def disk_used(path, recurse=False, workers=None, tree=False, index=None):
     """get the disk usage for the given directory
 
     Args:
         path (str): path string.
+        recurse (bool, default=False): if True, include all subdirectories.
+        workers (int, default=None): number of threads used to read folders.
+        tree (bool, default=False): if True, get usage for each subdirectory.
+        index (str, default=None): path to a usage cache, or True for default.
 
     Returns:
-        int corresponding to disk usage in blocks.
+        int corresponding to disk usage in kilobytes, or if tree=True, a dict
+        of ``{path: usage}`` for *path* and each of its subdirectories (where
+        each path is normalized, as in ``os.path.normpath``).
+
+    Notes:
+        If recurse=False, only the immediate contents of *path* are counted.
+        If recurse=True, the entire directory tree is counted (as in ``du``),
+        where links are not followed and files with multiple hard links are
+        only counted once. If workers > 1, folders are read concurrently by
+        a pool of threads. If tree=True, the entire directory tree is counted,
+        and the usage of each directory includes that of its subdirectories.
+
+        If *index* is given, the entire directory tree is counted, using a
+        persistent cache (a SQLite database, by default in ``~/.cache/pox``)
+        of the usage of each directory. Only directories whose inode or
+        modification time have changed are rescanned, and the totals are
+        rolled up from the cache. Note that changes in the size of existing
+        files are not detected until their directory is modified.
     """
-    size = 0
-    for file in os.listdir(path) + ['.']:
-        stat = os.stat(os.path.join(path, file))
-        if hasattr(stat, 'st_blocks'):
-            size += stat.st_blocks * 512
-        else:
-            # on some platform st_blocks is not available (e.g., Windows)
-            # approximate by rounding to next multiple of 512
-            size += (stat.st_size // 512 + 1) * 512
-    # We need to convert to int to avoid having longs on some systems (we
-    # don't want longs to avoid problems we SQLite)
-    return int(size / 1024.)
+    if not recurse and not tree and not index:
+        size = 0
+        for file in os.listdir(path) + ['.']:
+            size += _usage(os.stat(os.path.join(path, file)))
+        # We need to convert to int to avoid having longs on some systems (we
+        # don't want longs to avoid problems we SQLite)
+        return int(size / 1024.)
+    from .shutils import _traverse
+    path = os.path.normpath(path)
+    lock = threading.Lock()
+    inodes = set() # (st_dev, st_ino) of files with multiple hard links
+    if index:
+        from ._index import usage
+        path = os.path.abspath(path)
+    def scan(dirname, depth):
+        if index:
+            size, subdirs, links = usage(dirname, index)
+            for (dev, ino, _size) in links:
+                with lock:
+                    if (dev, ino) in inodes: continue
+                    inodes.add((dev, ino))
+                size += _size
+            subdirs = [(os.path.join(dirname, subdir), depth+1) \
+                       for subdir in subdirs]
+            return [(dirname, depth, size)], subdirs
+        try:
+            size = _usage(os.lstat(dirname))
+            with os.scandir(dirname) as it:
+                entries = list(it)
+        except OSError:
+            return [(dirname, depth, 0)], []
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append((entry.path, depth+1))
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if stat.st_nlink > 1:
+                key = (stat.st_dev, stat.st_ino)
+                with lock:
+                    if key in inodes: continue
+                    inodes.add(key)
+            size += _usage(stat)
+        return [(dirname, depth, size)], subdirs
+    sizes = list(_traverse(scan, path, 0, workers, ordered=False))
+    if not tree:
+        return int(sum(size for (_, _, size) in sizes) / 1024.)
+    # roll up the usage of each directory into its parent
+    usage = dict((dirname, size) for (dirname, _, size) in sizes)
+    for dirname, depth, _ in sorted(sizes, key=lambda x: x[1], reverse=True):
+        if depth: usage[os.path.dirname(dirname)] += usage[dirname]
+    return dict((dirname, int(size / 1024.)) for (dirname, size) in usage.items())
 
 
 def kbytes(text):
@@ -76,7 +150,8 @@ def kbytes(text):
 # then retry once. if it still fails, raise the exception
 RM_SUBDIRS_RETRY_TIME = 0.1
 
-def rmtree(path, self=True, ignore_errors=False, onerror=None):
+def rmtree(path, self=True, ignore_errors=False, onerror=None, workers=None,
+           background=False):
     """remove directories in the given path
 
     Args:
@@ -84,9 +159,12 @@ def rmtree(path, self=True, ignore_errors=False, onerror=None):
         self (bool, default=True): if False, delete subdirectories, not path.
         ignore_errors (bool, default=False): if True, silently ignore errors.
         onerror (function, default=None): custom error handler.
+        workers (int, default=None): number of threads used to delete.
+        background (bool, default=False): if True, delete in the background.
 
     Returns:
-        None
+        None, or if *workers* is given, a dict with the number of ``files``
+        and ``dirs`` removed, and the total ``bytes`` of the files removed.
 
     Notes:
         If self=False, the directory indicated by path is left in place,
@@ -98,7 +176,34 @@ def rmtree(path, self=True, ignore_errors=False, onerror=None):
         argument to the function that caused it to fail; and *exc_info* is a
         tuple returned by ``sys.exc_info()``. If ignore_errors=False and
         onerror=None, an exception is raised.
+
+        If *workers* is given, the directory tree is removed by a pool of
+        threads, with each thread removing a different subtree. Where the
+        platform supports it, entries are removed relative to an open file
+        descriptor of their directory (i.e. with *dir_fd*), which avoids
+        resolving the full path of each entry, and is safe against symlink
+        races. The removal of a directory is retried once, after a short
+        wait, before raising an error.
+
+        If background=True, each directory to delete is atomically renamed
+        into a trash directory on the same filesystem (``.pox-trash-<uid>``,
+        at the filesystem mount point, or else beside path), and ``rmtree``
+        returns immediately. Each process uses its own subdirectory of the
+        trash, which is never inside path, and which is removed when the
+        deletions in it are finished. The trashed directories are deleted by
+        a background thread, where errors are passed to onerror (if given),
+        and otherwise ignored. Use ``rmtree_wait`` to wait for the pending
+        deletions to finish (e.g. before exiting). Trash left behind by an
+        exited process is deleted the next time the trash directory is used.
+        The trash directory is only used if it is a directory (not a link)
+        owned by the user, with mode ``0o700``. If there is no such trash
+        directory, or a directory can not be renamed, it is deleted
+        immediately.
     """
+    if background:
+        return _rmtree_aside(path, self, ignore_errors, onerror, workers)
+    if workers:
+        return _prmtree(path, self, ignore_errors, onerror, workers)
     names = []
     try:
         names = os.listdir(path)
@@ -132,4 +237,522 @@ def rmtree(path, self=True, ignore_errors=False, onerror=None):
                         time.sleep(RM_SUBDIRS_RETRY_TIME)
 
 
+class _Node(object):
+    """a directory being removed by ``_prmtree``"""
+    __slots__ = ('parent', 'name', 'path', 'fd', 'pending')
+    def __init__(self, parent, name, path):
+        self.parent = parent # the parent _Node (None for the root)
+        self.name = name     # the name, relative to the parent directory
+        self.path = path     # the full path
+        self.fd = None       # an open file descriptor (if using dir_fd)
+        self.pending = 0     # number of subdirectories not yet removed
+
+
+def _prmtree(path, self=True, ignore_errors=False, onerror=None, workers=1):
+    """remove directories in the given path, using a pool of threads
+
+    Args:
+        path (str): path string of root of directories to delete.
+        self (bool, default=True): if False, delete subdirectories, not path.
+        ignore_errors (bool, default=False): if True, silently ignore errors.
+        onerror (function, default=None): custom error handler.
+        workers (int, default=1): number of threads used to delete.
+
+    Returns:
+        a dict with the number of ``files`` and ``dirs`` removed, and the
+        total ``bytes`` of the files removed.
+
+    Notes:
+        see ``rmtree`` for details. Subdirectories are removed depth-first
+        from a shared stack, and each directory is removed once all of its
+        subdirectories have been removed, so the number of open directories
+        stays small.
+    """
+    use_fd = os.open in os.supports_dir_fd and \
+             os.unlink in os.supports_dir_fd and \
+             os.rmdir in os.supports_dir_fd and os.scandir in os.supports_fd
+    flags = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | \
+            getattr(os, 'O_NOFOLLOW', 0) | getattr(os, 'O_CLOEXEC', 0)
+    counts = dict(files=0, dirs=0, bytes=0)
+    cond = threading.Condition()
+    stack = []; state = dict(done=False, error=None)
+    opened = set() # open file descriptors
+
+    def error(func, path):
+        if ignore_errors: return
+        if onerror is not None:
+            onerror(func, path, sys.exc_info())
+            return
+        raise
+
+    def rmdir(node):
+        # allow the rmdir to fail once, wait and re-try.
+        for retry in (True, False):
+            try:
+                if node.parent is None or not use_fd:
+                    os.rmdir(node.path)
+                else:
+                    os.rmdir(node.name, dir_fd=node.parent.fd)
+                return True
+            except OSError:
+                if not retry:
+                    error(os.rmdir, node.path)
+                    return False
+                time.sleep(RM_SUBDIRS_RETRY_TIME)
+
+    def complete(node):
+        # remove the directory, then its parent (if it's the last subdir)
+        while node is not None:
+            if node.fd is not None:
+                with cond: opened.discard(node.fd)
+                os.close(node.fd); node.fd = None
+            if node.parent is None: # the root
+                if self and rmdir(node):
+                    with cond: counts['dirs'] += 1
+                with cond:
+                    state['done'] = True
+                    cond.notify_all()
+                return
+            if rmdir(node):
+                with cond: counts['dirs'] += 1
+            with cond:
+                node = node.parent
+                node.pending -= 1
+                if node.pending: return
+
+    def process(node):
+        # remove the files in the directory, and queue the subdirectories
+        try:
+            if node.parent is None or not use_fd:
+                target = os.open(node.path, flags) if use_fd else node.path
+            else:
+                target = os.open(node.name, flags, dir_fd=node.parent.fd)
+            if use_fd:
+                node.fd = target
+                with cond: opened.add(target)
+            with os.scandir(target) as it:
+                entries = list(it)
+        except OSError:
+            error(os.listdir, node.path)
+            if node.parent is None:
+                with cond:
+                    state['done'] = True
+                    cond.notify_all()
+                return
+            return complete(node)
+        subdirs = []; files = 0; size = 0
+        for entry in entries:
+            fullname = os.path.join(node.path, entry.name)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if is_dir:
+                subdirs.append(_Node(node, entry.name, fullname))
+                continue
+            if node.parent is None and not self: # only remove subdirectories
+                continue
+            try:
+                nbytes = entry.stat(follow_symlinks=False).st_size
+                if use_fd: os.unlink(entry.name, dir_fd=node.fd)
+                else: os.unlink(fullname)
+                files += 1; size += nbytes
+            except OSError:
+                error(os.remove, fullname)
+        with cond:
+            counts['files'] += files; counts['bytes'] += size
+            node.pending = len(subdirs)
+            stack.extend(reversed(subdirs))
+            cond.notify(len(subdirs))
+        if not subdirs:
+            complete(node)
+
+    def worker():
+        while True:
+            with cond:
+                while not stack and not state['done'] and not state['error']:
+                    cond.wait()
+                if state['done'] or state['error']: return
+                node = stack.pop()
+            try:
+                process(node)
+            except BaseException:
+                with cond:
+                    state['error'] = sys.exc_info()[1]
+                    cond.notify_all()
+                return
+
+    stack.append(_Node(None, path, path))
+    threads = [threading.Thread(target=worker) for i in range(int(workers))]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    for fd in opened: os.close(fd)
+    if state['error'] is not None:
+        raise state['error']
+    return counts
+
+
+# trash directories of each process, as {(st_dev, pid): path} at mount
+# points, or {(parent, pid): path} beside the deleted directories
+_trashdirs = {}
+# deletions in the background, as a list of (path, onerror, workers)
+_pending = []
+_remover = dict(pid=None, busy=0)
+_cond = threading.Condition()
+
+
+def _trashdir(path):
+    """get a trash directory on the same filesystem as path, outside of path
+
+    Returns a subdirectory of ``.pox-trash-<uid>`` that is only used by this
+    process, or None if a trash directory owned by the user is not available.
+    """
+    if not hasattr(os, 'getuid'): # the owner can't be checked
+        return None
+    import uuid
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    pid = os.getpid()
+    try:
+        dev = os.stat(path).st_dev
+    except OSError:
+        return None
+    with _cond: # the trash at the mount point, if it isn't inside path
+        trash = _trashdirs.get((dev, pid)) or _trashdirs.get((parent, pid))
+        if trash is not None and os.path.isdir(trash) and \
+           os.path.dirname(os.path.dirname(trash)) != path:
+            return trash
+    # find the mount point, by walking up until the device changes
+    mount = path
+    while True:
+        up = os.path.dirname(mount)
+        try:
+            if up == mount or os.stat(up).st_dev != dev: break
+        except OSError:
+            break
+        mount = up
+    name = '.pox-trash-%s' % os.getuid()
+    for (key, root) in ((dev, mount), (parent, parent)):
+        if root == path: continue # the trash would be deleted with path
+        trash = os.path.join(root, name)
+        try:
+            os.makedirs(trash, mode=0o700, exist_ok=True)
+        except OSError:
+            continue
+        if _private(trash, dev): break
+    else:
+        return None
+    subdir = os.path.join(trash, '%s-%s' % (pid, uuid.uuid4().hex))
+    try:
+        os.mkdir(subdir, 0o700)
+    except OSError:
+        return None
+    with _cond:
+        _trashdirs[(key, pid)] = subdir
+    # delete any trash left behind by an exited process
+    try:
+        names = os.listdir(trash)
+    except OSError:
+        names = []
+    for name in names:
+        owner = name.split('-', 1)[0]
+        if not owner.isdigit() or _alive(int(owner)): continue
+        if _private(os.path.join(trash, name), dev):
+            _submit(os.path.join(trash, name))
+    return subdir
+
+
+def _private(path, dev):
+    """check if path is a directory on *dev*, only accessible to the user"""
+    import stat
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and \
+           stat.S_IMODE(info.st_mode) == 0o700 and info.st_dev == dev
+
+
+def _alive(pid):
+    """check if the process with the given pid is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError: # e.g. owned by another user
+        pass
+    return True
+
+
+def _remove_pending():
+    """delete the pending trashed directories (run in a background thread)"""
+    while True:
+        with _cond:
+            while not _pending:
+                _cond.wait()
+            path, onerror, workers = _pending.pop(0)
+        try:
+            rmtree(path, True, onerror is None, onerror, workers)
+        except Exception:
+            pass
+        finally:
+            with _cond:
+                if not _pending: _remove_trash()
+                _remover['busy'] -= 1
+                _cond.notify_all()
+
+
+def _remove_trash():
+    """remove the trash directories of this process (and .pox-trash-<uid>)"""
+    pid = os.getpid()
+    for (key, trash) in list(_trashdirs.items()):
+        if key[1] != pid: continue
+        for path in (trash, os.path.dirname(trash)):
+            try:
+                os.rmdir(path)
+            except OSError: # not empty, or already removed
+                break
+        if not os.path.isdir(trash):
+            del _trashdirs[key]
+    return
+
+
+def _submit(path, onerror=None, workers=None):
+    """queue the path for deletion in the background"""
+    with _cond:
+        _pending.append((path, onerror, workers))
+        _remover['busy'] += 1
+        if _remover['pid'] != os.getpid(): # (re)start after a fork
+            _remover['pid'] = os.getpid()
+            thread = threading.Thread(target=_remove_pending, daemon=True)
+            thread.start()
+        _cond.notify_all()
+
+
+def _rmtree_aside(path, self=True, ignore_errors=False, onerror=None,
+                  workers=None):
+    """rename directories into the trash, then delete them in the background
+
+    Args:
+        path (str): path string of root of directories to delete.
+        self (bool, default=True): if False, delete subdirectories, not path.
+        ignore_errors (bool, default=False): if True, silently ignore errors.
+        onerror (function, default=None): custom error handler.
+        workers (int, default=None): number of threads used to delete.
+
+    Returns:
+        None
+    """
+    import uuid
+    names = []
+    try:
+        names = os.listdir(path)
+    except os.error:
+        if onerror is not None:
+            onerror(os.listdir, path, sys.exc_info())
+        elif ignore_errors:
+            return
+        else:
+            raise
+    if self:
+        names = ['']
+
+    for name in names:
+        fullname = os.path.join(path, name) if name else path
+        if not os.path.isdir(fullname):
+            continue
+        with _cond: # hold the lock, so the trash isn't removed before use
+            trash = _trashdir(path)
+            if trash is not None:
+                target = os.path.join(trash, uuid.uuid4().hex)
+                try:
+                    os.rename(fullname, target)
+                    _submit(target, None if ignore_errors else onerror,
+                            workers)
+                    continue
+                except OSError:
+                    pass
+        # can't rename, so delete now
+        rmtree(fullname, True, ignore_errors, onerror, workers)
+    return
+
+
+def rmtree_wait(timeout=None):
+    """wait for directories deleted in the background to be removed
+
+    Args:
+        timeout (float, default=None): max time to wait (in seconds).
+
+    Returns:
+        True if all pending deletions are finished, else False.
+
+    Notes:
+        see ``rmtree`` with ``background=True``.
+    """
+    with _cond:
+        if _remover['pid'] != os.getpid(): # nothing queued in this process
+            return not _pending
+        return _cond.wait_for(lambda: not _remover['busy'], timeout)
+
+
+class CacheDir(object):
+    """a directory of cached items, kept within a given size budget
+
+    Args:
+        path (str): path string of the cache directory.
+        budget (str, default='1G'): max disk usage (e.g. ``'50G'`` or ``'500M'``).
+        max_age (float, default=None): max time (in seconds) since last access.
+        workers (int, default=None): number of threads used to delete items.
+
+    Notes:
+        Each file or directory in the top level of *path* is a cached item.
+        The directory is scanned once, when the ``CacheDir`` is created, and
+        then the size and access time of each item is tracked as items are
+        added (with ``add``) and used (with ``touch``), so the total usage is
+        known without another scan. When an item is added and the total usage
+        exceeds the *budget*, items are evicted (i.e. deleted) in order of
+        least-recent access. Items not accessed in *max_age* seconds are also
+        evicted. The *budget* can also be given as an int, in kilobytes. Use
+        ``rescan`` if the directory is modified by other processes.
+
+    Examples:
+        >>> cache = CacheDir('/tmp/artifacts', budget='50G')
+        >>> cache.add('build-1234.tar.gz')
+        []
+        >>> cache.touch('build-1234.tar.gz')
+        '/tmp/artifacts/build-1234.tar.gz'
+    """
+    def __init__(self, path, budget='1G', max_age=None, workers=None):
+        self.path = os.path.abspath(path)
+        self.budget = kbytes(budget) if isinstance(budget, str) else budget
+        self.max_age = max_age
+        self.workers = workers
+        self._lock = threading.RLock()
+        self._items = {} # {name: [bytes, last access]}
+        os.makedirs(self.path, exist_ok=True)
+        self.rescan()
+
+    def _measure(self, name):
+        """get the disk usage (in bytes) and access time of the item"""
+        fullname = os.path.join(self.path, name)
+        stat = os.lstat(fullname)
+        accessed = max(stat.st_atime, stat.st_mtime)
+        if os.path.isdir(fullname) and not os.path.islink(fullname):
+            return disk_used(fullname, recurse=True, workers=self.workers) \
+                   * 1024, accessed
+        return _usage(stat), accessed
+
+    def rescan(self):
+        """scan the cache directory, and update the size of all items"""
+        items = {}
+        for name in os.listdir(self.path):
+            try:
+                items[name] = list(self._measure(name))
+            except OSError:
+                continue
+        with self._lock:
+            self._items = items
+        return
+
+    @property
+    def size(self):
+        """the total disk usage of the cached items, in kilobytes"""
+        with self._lock:
+            return int(sum(size for (size, _) in self._items.values()) / 1024.)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def add(self, name):
+        """add the item at the given name in the cache directory
+
+        Args:
+            name (str): the name of a file or directory in the cache.
+
+        Returns:
+            list of string paths of the items evicted.
+
+        Notes:
+            the item should be written to the cache directory before it is
+            added. The item is measured, marked as used, and then items are
+            evicted as needed to keep within the budget.
+        """
+        size, _ = self._measure(name)
+        with self._lock:
+            self._items[name] = [size, time.time()]
+        return self.evict(keep=name)
+
+    def touch(self, name):
+        """mark the item at the given name as used, and return its path"""
+        fullname = os.path.join(self.path, name)
+        now = time.time()
+        with self._lock:
+            if name not in self._items:
+                raise KeyError(name)
+            self._items[name][1] = now
+        try: # record the access, for the next scan
+            os.utime(fullname, (now, os.lstat(fullname).st_mtime))
+        except OSError:
+            pass
+        return fullname
+
+    def remove(self, name):
+        """delete the item at the given name from the cache"""
+        with self._lock:
+            self._items.pop(name, None)
+        self._delete([os.path.join(self.path, name)])
+        return
+
+    def evict(self, keep=None):
+        """delete expired items, and items exceeding the budget
+
+        Args:
+            keep (str, default=None): name of an item that is not evicted.
+
+        Returns:
+            list of string paths of the items evicted.
+
+        Notes:
+            items not accessed in *max_age* seconds are evicted, then items
+            are evicted in order of least-recent access until the total usage
+            is within the budget. The evicted items are deleted in one batch.
+        """
+        evicted = []
+        with self._lock:
+            lru = sorted(self._items.items(), key=lambda item: item[1][1])
+            size = sum(size for (_, (size, _)) in lru)
+            budget = self.budget * 1024
+            expired = time.time() - self.max_age if self.max_age else None
+            for name, (nbytes, accessed) in lru:
+                if name == keep: continue
+                if not (size > budget or (expired and accessed < expired)):
+                    continue
+                del self._items[name]
+                size -= nbytes
+                evicted.append(os.path.join(self.path, name))
+        self._delete(evicted)
+        return evicted
+
+    def _delete(self, paths):
+        """delete the files and directories at the given paths"""
+        def delete(path):
+            if os.path.isdir(path) and not os.path.islink(path):
+                rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        if self.workers and len(paths) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=int(self.workers)) as pool:
+                list(pool.map(delete, paths))
+        else:
+            for path in paths: delete(path)
+        return
+
+
 # EOF
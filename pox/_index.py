@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 2026 The Uncertainty Quantification Foundation.
+# License: 3-clause BSD.  The full license text is available at:
+#  - https://github.com/uqfoundation/pox/blob/master/LICENSE
+"""
+Persistent index of directory contents, for repeated filesystem searches.
+"""
+
+import os
+import stat
+import sqlite3
+import threading
+import time
+
+# directories modified within this many seconds (of a scan) are not trusted,
+# as further changes could be made without changing the modification time
+RACY_TIME = 2.0
+
+# contents of each directory are stored as 'type+name' joined by '\0'
+# usage of each directory is stored as the bytes used by the directory and
+# its files, the subdirectory names joined by '\0', and 'dev:ino:bytes' for
+# each file with multiple hard links, joined by ','
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime INTEGER,
+                                 entries TEXT);
+CREATE TABLE IF NOT EXISTS usage (path TEXT PRIMARY KEY, ino INTEGER,
+                                  mtime INTEGER, size INTEGER, subdirs TEXT,
+                                  links TEXT);
+"""
+
+# open connections, as {(pid, filename): connection}, for each thread
+_local = threading.local()
+
+
+def cachedir():
+    """get the path of the directory used for pox's cached data
+
+    Args:
+        None
+
+    Returns:
+        string path of the cache directory.
+
+    Notes:
+        the cache directory is ``$XDG_CACHE_HOME/pox`` (``~/.cache/pox``),
+        unless ``$POX_CACHE_DIR`` is set.
+    """
+    path = os.environ.get('POX_CACHE_DIR')
+    if path: return path
+    path = os.environ.get('XDG_CACHE_HOME') or \
+           os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(path, 'pox')
+
+
+def index_file(index=True):
+    """get the path of the database file for the given index
+
+    Args:
+        index (str, default=True): path to the database, or True for default.
+
+    Returns:
+        string path of the database file.
+    """
+    if index is True:
+        return os.path.join(cachedir(), 'index.db')
+    return os.path.abspath(index)
+
+
+def _connect(index):
+    """get an open connection to the index database (for this thread)"""
+    filename = index_file(index)
+    conns = getattr(_local, 'conns', None)
+    if conns is None: conns = _local.conns = {}
+    key = (os.getpid(), filename)
+    conn = conns.get(key)
+    if conn is None:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        conn = sqlite3.connect(filename, timeout=60)
+        try: # allow concurrent readers and a writer, across processes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.DatabaseError:
+            pass
+        with conn:
+            conn.executescript(_SCHEMA)
+        conns[key] = conn
+    return conn
+
+
+def _entry_type(entry):
+    """get the type of the ``os.DirEntry`` as in ``find`` (e.g. ``'f'``)"""
+    if entry.is_symlink(): return 'l'
+    if entry.is_dir(follow_symlinks=False): return 'd'
+    if entry.is_file(follow_symlinks=False): return 'f'
+    mode = entry.stat(follow_symlinks=False).st_mode
+    if stat.S_ISSOCK(mode): return 's'
+    if stat.S_ISBLK(mode): return 'b'
+    if stat.S_ISCHR(mode): return 'c'
+    return ''
+
+
+def scandir(path):
+    """get the names and types of the contents of the given directory
+
+    Args:
+        path (str): path string of the directory.
+
+    Returns:
+        list of tuples of ``(name, type)``, where type is as in ``find``.
+    """
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                entries.append((entry.name, _entry_type(entry)))
+            except OSError:
+                entries.append((entry.name, ''))
+    return entries
+
+
+def listdir(path, index=True):
+    """get the names and types of the contents of the given directory
+
+    Args:
+        path (str): absolute path string of the directory.
+        index (str, default=True): path to the database, or True for default.
+
+    Returns:
+        list of tuples of ``(name, type)``, where type is as in ``find``.
+
+    Notes:
+        the contents are read from the index, unless the modification time
+        of the directory has changed since it was indexed. Otherwise, the
+        directory is scanned, and the index is updated.
+
+        if the directory can not be read, an empty list is returned.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return []
+    conn = _connect(index)
+    row = conn.execute('SELECT mtime, entries FROM dirs WHERE path=?',
+                       (path,)).fetchone()
+    if row is not None and row[0] == mtime:
+        if not row[1]: return []
+        return [(item[1:], item[0].strip('-')) for item in row[1].split('\0')]
+    try:
+        entries = scandir(path)
+    except OSError:
+        return []
+    # don't trust recently modified directories (in case of later changes)
+    if time.time() - mtime * 1e-9 < RACY_TIME: mtime = None
+    packed = '\0'.join((type or '-') + name for (name, type) in entries)
+    with conn:
+        conn.execute('INSERT OR REPLACE INTO dirs VALUES (?,?,?)',
+                     (path, mtime, packed))
+    return entries
+
+
+def usage(path, index=True):
+    """get the disk usage of the given directory, excluding subdirectories
+
+    Args:
+        path (str): absolute path string of the directory.
+        index (str, default=True): path to the database, or True for default.
+
+    Returns:
+        tuple of ``(size, subdirs, links)``, where *size* is the usage (in
+        bytes) of the directory and the files in it, *subdirs* is a list of
+        the names of subdirectories, and *links* is a list of ``(st_dev,
+        st_ino, size)`` for files with multiple hard links (which are not
+        included in *size*).
+
+    Notes:
+        the usage is read from the index, unless the inode or modification
+        time of the directory has changed since it was indexed. Otherwise,
+        the directory is scanned, and the index is updated. Links are not
+        followed. Since changing the size of an existing file does not modify
+        the directory, such changes are not detected until the directory is
+        modified (e.g. by adding, removing, or renaming a file).
+
+        if the directory can not be read, ``(0, [], [])`` is returned.
+    """
+    from ._disk import _usage
+    try:
+        stat = os.lstat(path)
+    except OSError:
+        return 0, [], []
+    conn = _connect(index)
+    row = conn.execute('SELECT ino, mtime, size, subdirs, links FROM usage '
+                       'WHERE path=?', (path,)).fetchone()
+    if row is not None and row[:2] == (stat.st_ino, stat.st_mtime_ns):
+        subdirs = row[3].split('\0') if row[3] else []
+        links = [tuple(int(i) for i in link.split(':')) \
+                 for link in row[4].split(',')] if row[4] else []
+        return row[2], subdirs, links
+    size = _usage(stat); subdirs = []; links = []
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return size, [], []
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+                continue
+            info = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if info.st_nlink > 1:
+            links.append((info.st_dev, info.st_ino, _usage(info)))
+        else:
+            size += _usage(info)
+    # don't trust recently modified directories (in case of later changes)
+    mtime = stat.st_mtime_ns
+    if time.time() - mtime * 1e-9 < RACY_TIME: mtime = None
+    with conn:
+        conn.execute('INSERT OR REPLACE INTO usage VALUES (?,?,?,?,?,?)',
+                     (path, stat.st_ino, mtime, size, '\0'.join(subdirs),
+                      ','.join('%d:%d:%d' % link for link in links)))
+    return size, subdirs, links
+
+
+# EOF
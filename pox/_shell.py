@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 2026 The Uncertainty Quantification Foundation.
+# License: 3-clause BSD.  The full license text is available at:
+#  - https://github.com/uqfoundation/pox/blob/master/LICENSE
+"""
+Long-lived shell coprocesses, for running many small shell commands.
+"""
+
+import os
+import sys
+import threading
+
+# default shell used by the coprocesses
+SHELL = '/bin/sh'
+
+
+class Shell(object):
+    """a long-lived shell coprocess, that runs one command at a time
+
+    Args:
+        shell (str, default='/bin/sh'): path to a POSIX shell.
+
+    Notes:
+        each command is written to the stdin of the shell, followed by a
+        command that prints a sentinel (a random token) and the exit status.
+        The shell's stdout is read until the sentinel is found, so no process
+        is created to run a shell builtin. Commands read from ``/dev/null``,
+        and write stdout and stderr to a named pipe (in a private temporary
+        directory) that is new for each command. Each command runs in a
+        subshell, in the current directory and with the current ``os.environ``
+        of the calling process, so changes made by the command (e.g. ``cd``,
+        ``export``, or ``exit``) don't affect the shell or later commands. The
+        shell is started in a new session, so it leads its own process group.
+    """
+    def __init__(self, shell=SHELL):
+        import uuid
+        import tempfile
+        import itertools
+        from subprocess import Popen, PIPE, STDOUT
+        self.process = Popen([shell], stdin=PIPE, stdout=PIPE, stderr=STDOUT,
+                             close_fds=True, bufsize=0, start_new_session=True)
+        self.sentinel = uuid.uuid4().hex.encode()
+        self.environ = dict(os.environ) # the environment of the shell
+        self.pid = os.getpid()
+        self.tmpdir = tempfile.mkdtemp(prefix='pox-shell-')
+        self.count = itertools.count()
+
+    def alive(self):
+        """check if the shell is running (and belongs to this process)"""
+        return self.pid == os.getpid() and self.process.poll() is None
+
+    def run(self, command, timeout=None):
+        """run the command, and return a tuple of ``(status, output)``
+
+        Args:
+            command (str): the shell command.
+            timeout (float, default=None): max time (in seconds) to wait.
+
+        Returns:
+            tuple of the int exit status, and the output of the command (str).
+
+        Notes:
+            the output of the command is written to a new named pipe, which is
+            read until it is closed, so (as with ``Popen``) the output of any
+            background jobs of the command is included, and is never given to
+            a later command. If the command doesn't finish within *timeout*,
+            the process group of the shell (i.e. the shell, the command, and
+            its background jobs) is killed, and ``subprocess.TimeoutExpired``
+            is raised. OSError is raised if the shell has exited before the
+            command is run.
+        """
+        import time
+        import select
+        from subprocess import TimeoutExpired
+        quote = lambda s: "'%s'" % s.replace("'", "'\\''")
+        fifo = os.path.join(self.tmpdir, str(next(self.count)))
+        os.mkfifo(fifo, 0o600)
+        fds = []
+        try:
+            # hold a write end of the pipe, until the command has finished
+            fds.append(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK))
+            fds.append(os.open(fifo, os.O_WRONLY | os.O_NONBLOCK))
+            pipe = fds[0]
+            script = []
+            # update the shell's environment with changes to os.environ
+            environ = dict(os.environ)
+            for name in set(self.environ).difference(environ):
+                if _isname(name): script.append('unset %s' % name)
+            for (name, value) in environ.items():
+                if self.environ.get(name) != value and _isname(name):
+                    script.append('export %s=%s' % (name, quote(value)))
+            self.environ = environ
+            # eval the quoted command in a subshell, so the script is always
+            # well-formed, and the command can't change the state of the shell
+            script.append('( cd -- %s && eval %s ) </dev/null >%s 2>&1' % \
+                          (quote(os.getcwd()), quote(command), quote(fifo)))
+            script.append("printf '\\n%s %%d\\n' $?\n" % \
+                          self.sentinel.decode())
+            try:
+                self.process.stdin.write(os.fsencode('\n'.join(script)))
+            except (OSError, ValueError):
+                self.close()
+                raise OSError("shell exited before %r" % command)
+            fd = self.process.stdout.fileno()
+            poller = select.poll()
+            poller.register(fd, select.POLLIN)
+            poller.register(pipe, select.POLLIN)
+            end = None if timeout is None else time.monotonic() + timeout
+            marker = b'\n' + self.sentinel + b' '
+            data = bytearray(); output = bytearray(); i = -1
+            status = None; closed = False
+            while status is None or not closed:
+                if end is None:
+                    events = poller.poll()
+                else:
+                    left = end - time.monotonic()
+                    events = poller.poll(left * 1000) if left > 0 else []
+                    if not events:
+                        self.kill()
+                        raise TimeoutExpired(command, timeout)
+                for (ready, _) in events:
+                    if ready == pipe: # the output of the command
+                        try:
+                            chunk = os.read(pipe, 65536)
+                        except BlockingIOError:
+                            continue
+                        output += chunk
+                        if not chunk: # all the writers have closed the pipe
+                            poller.unregister(pipe); closed = True
+                        continue
+                    chunk = os.read(fd, 65536)
+                    if not chunk: # the shell exited unexpectedly
+                        self.close()
+                        raise OSError("shell exited while running %r" % \
+                                      command)
+                    data += chunk
+                    # search from before the new data, in case it's split
+                    if i < 0:
+                        i = data.find(marker,
+                                      max(0, len(data)-len(chunk)-len(marker)))
+                    if i >= 0 and data.find(b'\n', i+len(marker)) > 0:
+                        status = int(data[i+len(marker):].split(b'\n',1)[0])
+                        output[:0] = data[:i] # e.g. errors from the shell
+                        poller.unregister(fd)
+                        os.close(fds.pop()) # wait for any background jobs
+            return status, os.fsdecode(bytes(output))
+        finally:
+            for fd in fds: os.close(fd)
+            try:
+                os.unlink(fifo)
+            except OSError: # the shell was closed
+                pass
+
+    def kill(self):
+        """kill the shell, and the processes in its process group"""
+        import signal
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError: # pragma: no cover
+            pass
+        self.close()
+
+    def close(self):
+        """stop the shell, after the current command finishes"""
+        if self.pid != os.getpid(): # belongs to the parent of a fork
+            return
+        try:
+            self.process.stdin.close()
+        except OSError: # pragma: no cover
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except Exception:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        import shutil
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class ShellPool(object):
+    """a pool of long-lived shell coprocesses
+
+    Args:
+        size (int, default=None): max number of shells [default: cpu count].
+        shell (str, default='/bin/sh'): path to a POSIX shell.
+
+    Notes:
+        shells are started as needed, up to *size* shells, and are reused
+        for later commands, so running a command doesn't start a new shell.
+        The pool can be used from many threads, where each command runs in
+        a shell that isn't in use (or waits until one is available). After
+        ``os.fork``, the child process starts its own shells.
+
+    Examples:
+        >>> pool = ShellPool()
+        >>> pool.run('echo hello')
+        (0, 'hello\\n')
+    """
+    def __init__(self, size=None, shell=SHELL):
+        self.size = size or os.cpu_count() or 1
+        self.shell = shell
+        self._cond = threading.Condition()
+        self._idle = []
+        self._count = 0
+        self._pid = os.getpid()
+
+    def _acquire(self):
+        """get an idle shell, starting a new shell if needed"""
+        with self._cond:
+            if self._pid != os.getpid(): # forget the shells of the parent
+                self._idle = []; self._count = 0; self._pid = os.getpid()
+            while True:
+                while self._idle:
+                    shell = self._idle.pop()
+                    if shell.alive(): return shell
+                    self._count -= 1
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                self._cond.wait()
+        try:
+            return Shell(self.shell)
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, shell):
+        """return the shell to the pool (or discard it, if it has exited)"""
+        with self._cond:
+            if self._pid != os.getpid(): return
+            if shell is not None and shell.alive():
+                self._idle.append(shell)
+            else:
+                self._count -= 1
+            self._cond.notify()
+
+    def run(self, command, timeout=None):
+        """run the command in a shell, and return ``(status, output)``"""
+        shell = self._acquire()
+        try:
+            return shell.run(command, timeout)
+        finally:
+            self._release(shell)
+
+    def close(self):
+        """stop the idle shells in the pool"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+        for shell in idle:
+            shell.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _isname(name):
+    """check if the name is a valid name for a shell variable"""
+    return name.isidentifier() and name.isascii()
+
+
+_pool = None
+_lock = threading.Lock()
+
+def pool():
+    """get the shared pool of shells, or None if shells are not available"""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                if sys.platform[:3] == 'win' or not os.path.exists(SHELL):
+                    _pool = False
+                else:
+                    import atexit
+                    _pool = ShellPool()
+                    atexit.register(_pool.close)
+    return _pool or None
+
+
+# EOF
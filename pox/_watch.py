@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+#
+# Author: Mike McKerns (mmckerns @caltech and @uqfoundation)
+# Copyright (c) 2026 The Uncertainty Quantification Foundation.
+# License: 3-clause BSD.  The full license text is available at:
+#  - https://github.com/uqfoundation/pox/blob/master/LICENSE
+"""
+Filesystem event utilities, using Linux inotify (through ctypes).
+"""
+
+import os
+import sys
+import struct
+
+# inotify flags and event masks (from <sys/inotify.h>)
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+# events that indicate a new entry may have appeared in a directory
+IN_NEW = IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE | IN_ATTRIB
+
+_EVENT = struct.Struct('iIII') # wd, mask, cookie, len
+_libc = None
+
+
+def _load():
+    """get the C library, if it provides inotify (else return None)"""
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith('linux'):
+            try:
+                import ctypes
+                libc = ctypes.CDLL(None, use_errno=True)
+                libc.inotify_init1; libc.inotify_add_watch
+                _libc = libc
+            except (ImportError, OSError, AttributeError):
+                pass
+    return _libc or None
+
+
+class Inotify(object):
+    """watch directories for new entries, using Linux inotify
+
+    Args:
+        None
+
+    Notes:
+        use ``add`` to watch a directory, then ``wait`` to block until an
+        event occurs (or a timeout expires). An OSError is raised if inotify
+        is not available, so use ``watcher()`` to get a watcher, or None.
+    """
+    def __init__(self):
+        libc = _load()
+        if libc is None:
+            raise OSError("inotify is not available")
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            import ctypes
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.dirs = {}  # {wd: path}
+
+    def add(self, path, mask=IN_NEW):
+        """watch the given directory for events given by *mask*"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            import ctypes
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        self.dirs[wd] = path
+        return wd
+
+    def wait(self, timeout=None):
+        """wait for events, and return a list of ``(directory, name)``
+
+        Args:
+            timeout (float, default=None): max time to wait (in seconds).
+
+        Returns:
+            list of tuples of the directory and name for each event. If the
+            event queue overflowed, a tuple of ``(None, None)`` is included.
+        """
+        import select
+        poller = select.poll() # (select fails for fds >= FD_SETSIZE)
+        poller.register(self.fd, select.POLLIN)
+        try:
+            ready = poller.poll(None if timeout is None else timeout * 1000)
+        except InterruptedError: # pragma: no cover
+            ready = []
+        events = []
+        while ready:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            i = 0
+            while i + _EVENT.size <= len(data):
+                wd, mask, cookie, size = _EVENT.unpack_from(data, i)
+                i += _EVENT.size
+                name = os.fsdecode(data[i:i+size].rstrip(b'\0'))
+                i += size
+                if mask & IN_Q_OVERFLOW:
+                    events.append((None, None))
+                elif mask & IN_IGNORED:
+                    self.dirs.pop(wd, None)
+                elif wd in self.dirs:
+                    events.append((self.dirs[wd], name))
+        return events
+
+    def close(self):
+        """stop watching, and release the inotify instance"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.dirs.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception: # pragma: no cover
+            pass
+
+
+def watcher():
+    """get an inotify watcher, or None if inotify is not available"""
+    try:
+        return Inotify()
+    except OSError:
+        return None
+
+
+# EOF
@@ -13,10 +13,12 @@ shell utilities for user environment and filesystem exploration
 
 import os
 import sys
+import stat
+import functools
 from subprocess import Popen, PIPE, STDOUT
 popen4 = {'shell':True, 'stdin':PIPE, 'stdout':PIPE, 'stderr':STDOUT, \
           'close_fds':True}
-from ._disk import rmtree
+from ._disk import rmtree, rmtree_wait
 
 MODE = eval('0o775')
 
@@ -123,6 +125,31 @@ def minpath(path,pathsep=None):
             shortlist.append(item)
     return pathsep.join(shortlist)
 
+@functools.lru_cache(maxsize=256)
+def _matcher(patterns):
+    '''compile a pattern string to a function that matches names to it
+
+    Args:
+        patterns (str): name or partial name, with basic pattern matching.
+
+    Returns:
+        function of a name string, that returns a match object (or None).
+
+    Notes:
+        multiple patterns can be specified by splitting patterns with a ``;``.
+        All patterns are compiled into a single regular expression, so the
+        cost of matching does not increase with the number of patterns.
+        Matching is as with ``fnmatch.fnmatch`` (i.e. case-insensitive only
+        where the OS is case-insensitive).
+    '''
+    import fnmatch
+    import re
+    regex = '|'.join(fnmatch.translate(os.path.normcase(pattern)) \
+                     for pattern in patterns.split(';'))
+    match = re.compile(regex).match
+    if os.path.normcase('A/') == 'A/': return match
+    return lambda name: match(os.path.normcase(name))
+
 #NOTE: broke backward compatibility January 17, 2014
 #      firstval=False --> all=True
 #      pathDups=True  --> minimal=False
@@ -145,14 +172,15 @@ def env(variable,all=True,minimal=False):
         {\'PYTHONPATH\': \'.\', \'PATH\': \'.:/usr/bin:/bin:/usr/sbin:/sbin\'}
     '''
     #better than os.path.expandvars ?
-    import fnmatch
+    match = _matcher(variable)
     vals = {}
     for key,value in os.environ.items():
-        if fnmatch.fnmatch(key,variable):
+        if match(key):
             vals[key] = value
     if minimal:
+        match = _matcher('*PATH')
         for key,value in vals.items():
-            if fnmatch.fnmatch(key,'*PATH'):
+            if match(key):
                 vals[key] = minpath(value)
     if not all:
         if len(vals) == 0: return
@@ -172,22 +200,105 @@ def whereis(prog,all=False): #Unix specific (Windows punts to which)
 
     Returns:
         string path of the executable, or list of path strings.
+
+    Notes:
+        the standard binary, manual, and source directories are searched
+        (as done by the ``whereis`` command), using an index of the contents
+        of those directories that is built once, and reused until one of the
+        directories is modified.
     '''
     if sys.platform[:3] == 'win': return which(prog,all=all)
-    whcom = 'whereis '
-    p = Popen(whcom+prog, **popen4)
-    p.stdin.close()
-    pathstr = p.stdout.read()
-    p.stdout.close()
-    pathstr = pathstr.decode()
-    paths = pathstr.strip().split(":")[-1] #XXX: ':' ???  -1 ???
-    pathlist = paths.strip().split()
+    pathlist = list(_whereis_index().get(prog, ()))
     if not pathlist:
         if not all: pathlist = ''
         return pathlist
     if not all: return pathlist[0]
     return pathlist
 
+# standard install locations searched by whereis (as in util-linux whereis)
+_BINDIRS = ['/usr/bin', '/usr/sbin', '/bin', '/sbin', '/usr/lib/*-linux-gnu',
+            '/usr/lib', '/usr/lib32', '/usr/lib64', '/etc', '/usr/etc', '/lib',
+            '/lib64', '/usr/games', '/usr/local/bin', '/usr/local/sbin',
+            '/usr/local/etc', '/usr/local/lib', '/usr/local/games',
+            '/usr/include', '/usr/local', '/usr/libexec', '/usr/share']
+_MANDIRS = ['/usr/man/*', '/usr/share/man/*', '/usr/X386/man/*',
+            '/usr/X11/man/*', '/usr/local/man/*', '/usr/local/share/man/*',
+            '/usr/share/info']
+_SRCDIRS = ['/usr/src/*', '/usr/local/src/*']
+_COMPRESSED = ('.gz', '.bz2', '.xz', '.zst', '.Z')
+
+# index for whereis, as (dirs, mtimes, {name: [paths]})
+_whereis_cache = None
+# directories searched by whereis, as {(PATH,MANPATH): dirs}
+_whereis_dirs_cache = {}
+
+def _whereis_dirs():
+    '''get the (bin, man, src) directories searched by whereis'''
+    import glob
+    key = (os.environ.get('PATH', ''), os.environ.get('MANPATH', ''))
+    if key in _whereis_dirs_cache: return _whereis_dirs_cache[key]
+    path = key[0].split(os.pathsep)
+    manpath = key[1].split(os.pathsep)
+    bindirs = _BINDIRS + [d for d in path if os.path.isabs(d)]
+    mandirs = _MANDIRS + [os.path.join(d, '*') for d in manpath if d]
+    searched = set(); dirs = []
+    for kind, patterns in (('bin', bindirs), ('man', mandirs), ('src', _SRCDIRS)):
+        for pattern in patterns:
+            for _dir in sorted(glob.glob(pattern)) if '*' in pattern else [pattern]:
+                try: # skip duplicate directories (e.g. symlinks /bin -> /usr/bin)
+                    st = os.stat(_dir)
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) in searched or not os.path.isdir(_dir):
+                    continue
+                searched.add((st.st_dev, st.st_ino))
+                dirs.append((kind, _dir))
+    dirs = _whereis_dirs_cache[key] = tuple(dirs)
+    return dirs
+
+def _whereis_index():
+    '''get the index of names to paths in the standard install locations
+
+    Returns:
+        dict of ``{name: [paths]}``, with binaries, then manuals, then sources.
+
+    Notes:
+        binaries must match the name exactly, while manuals and sources match
+        the name followed by one extension (e.g. ``ls.1.gz`` matches ``ls``).
+        The index is built once, and rebuilt only if the search directories
+        (or their modification times) change.
+    '''
+    global _whereis_cache
+    dirs = _whereis_dirs()
+    mtimes = []
+    for kind, _dir in dirs:
+        try:
+            mtimes.append(os.stat(_dir).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    cached = _whereis_cache
+    if cached is not None and cached[0] == dirs and cached[1] == mtimes:
+        return cached[2]
+    index = {}
+    for kind, _dir in dirs:
+        try:
+            names = os.listdir(_dir)
+        except OSError:
+            continue
+        for name in names:
+            fullname = os.path.join(_dir, name)
+            if kind == 'bin':
+                index.setdefault(name, []).append(fullname)
+                continue
+            if kind == 'man' and name.endswith(_COMPRESSED):
+                name = name.rsplit('.', 1)[0]
+            # register under the name, and the name without its extension
+            for key in (name, name.rsplit('.', 1)[0]):
+                paths = index.setdefault(key, [])
+                if fullname not in paths: paths.append(fullname)
+    _whereis_cache = (dirs, mtimes, index)
+    return index
+
 #NOTE: broke backward compatibility January 17, 2014
 #      allowlink=True   --> allow_links=True
 #      allowerror=False --> ignore_errors=True
@@ -200,11 +311,17 @@ def which(prog,allow_links=True,ignore_errors=True,all=False): #Unix specific
     Args:
         prog (str): name of an executable to search for (e.g. ``python``).
         allow_links (bool, default=True): if False, replace link with fullpath.
-        ignore_errors (bool, default=True): if True, ignore search errors.
+        ignore_errors (bool, default=True): ignored (kept for compatibility).
         all (bool, default=False): if True, get list of paths for executable.
 
     Returns:
         if all=True, get a list of string paths, else return a string path. 
+
+    Notes:
+        if the executable is not found, an empty string (or list) is returned.
+
+        the search is done in-process, and results are cached until one of
+        the directories on the search path is modified.
     '''
     if sys.platform[:3] == 'win':
         # try to deal with windows laziness about extensions
@@ -218,25 +335,58 @@ def which(prog,allow_links=True,ignore_errors=True,all=False): #Unix specific
         if not all: return paths[0] if len(paths) else ''
         return paths
     # non-windows
-    whcom = 'which '
-    if all: whcom += '-a '
-    p = Popen(whcom+prog, **popen4)
-    p.stdin.close()
-    pathstr = p.stdout.read()
-    p.stdout.close()
-    errind = 'no '+prog+' in'
-    pathstr = pathstr.decode()
-    if (errind in pathstr) and (ignore_errors):
-        return None
-    pathstr = minpath(pathstr.strip(),os.linesep)
-    paths = pathstr.split(os.linesep)
+    paths = _which(prog)
     for i in range(len(paths)):
         if not allow_links and os.path.islink(paths[i]):
             paths[i] = os.path.realpath(paths[i])
     if not all: return paths[0] if len(paths) else ''
     return paths
-    
-def find(patterns,root=None,recurse=True,type=None,verbose=False):
+
+# cache of search results for which, as {(prog,PATH,cwd): (mtimes,paths)}
+_which_cache = {}
+
+def _which(prog, path=None):
+    '''get a list of all executables named *prog* on the search path
+
+    Args:
+        prog (str): name of an executable to search for (e.g. ``python``).
+        path (str, default=None): search path [default: ``$PATH``].
+
+    Returns:
+        list of string paths, in search path order.
+
+    Notes:
+        results are cached by the search path, and are reused until the
+        modification time of one of the directories on the path changes.
+    '''
+    isexe = lambda p: os.path.isfile(p) and os.access(p, os.X_OK)
+    if os.sep in prog or (os.altsep and os.altsep in prog):
+        return [prog] if isexe(prog) else []
+    if path is None: path = os.environ.get('PATH', os.defpath)
+    dirs = [d or os.curdir for d in minpath(path).split(os.pathsep)]
+    # relative directories depend on the current directory
+    cwd = None if all(os.path.isabs(d) for d in dirs) else os.getcwd()
+    mtimes = []
+    for _dir in dirs:
+        try:
+            mtimes.append(os.stat(_dir).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    key = (prog, path, cwd)
+    cached = _which_cache.get(key)
+    if cached is not None and cached[0] == mtimes:
+        return list(cached[1])
+    paths = []
+    for _dir, mtime in zip(dirs, mtimes):
+        if mtime is None: continue
+        candidate = os.path.join(_dir, prog)
+        if isexe(candidate) and candidate not in paths:
+            paths.append(candidate)
+    _which_cache[key] = (mtimes, paths)
+    return list(paths)
+
+def find(patterns,root=None,recurse=True,type=None,verbose=False,
+         workers=None,index=None):
     '''get the path to a file or directory
 
     Args:
@@ -245,16 +395,27 @@ def find(patterns,root=None,recurse=True,type=None,verbose=False):
         recurse (bool, default=True): if True, recurse downward from *root*.
         type (str, default=None): a search filter.
         verbose (bool, default=False): if True, be verbose about the search.
+        workers (int, default=None): number of threads used to read folders.
+        index (str, default=None): path to a search index, or True for default.
 
     Returns:
         a list of string paths.
 
     Notes:
-        on some OS, *recursion* can be specified by recursion depth (*int*),
-        and *patterns* can be specified with basic pattern matching. Also,
+        *recursion* can be specified by recursion depth (*int*), and
+        *patterns* can be specified with basic pattern matching. Also,
         multiple patterns can be specified by splitting patterns with a ``;``.
         The *type* can be one of ``{file, dir, link, socket, block, char}``.
 
+        the search is done in a single pass over the directory tree, with all
+        patterns matched at once, and does not require a ``find`` executable.
+        If workers > 1, folders are read concurrently by a pool of threads.
+
+        if *index* is given, the contents of each folder are recorded in a
+        persistent index (a SQLite database, by default in ``~/.cache/pox``),
+        which is shared across processes. Later searches read the contents
+        from the index, and only rescan folders that have since been modified.
+
     Examples:
         >>> find(\'pox*\', root=\'..\')
         [\'/Users/foo/pox/pox\', \'/Users/foo/pox/scripts/pox_launcher.py\']
@@ -273,43 +434,161 @@ def find(patterns,root=None,recurse=True,type=None,verbose=False):
     else:
         if verbose: print("type '%s' not understood, will be ignored" % type)
         type = None
+    if verbose: print("searching %s for %r" % (root, patterns))
+    return list(_ifind(root, patterns, recurse, type, workers, index=index))
+
+# file type filters for find, as in the '-type' flag of the ``find`` command
+_FTYPES = {'f':stat.S_ISREG, 'd':stat.S_ISDIR, 'l':stat.S_ISLNK,
+           's':stat.S_ISSOCK, 'b':stat.S_ISBLK, 'c':stat.S_ISCHR}
+
+def _ftype(entry, type):
+    '''check if the ``os.DirEntry`` is of the given type (as in ``find``)'''
+    # use the type cached by scandir, and only stat for 'special' files
+    if type == 'l': return entry.is_symlink()
+    if type == 'd': return entry.is_dir(follow_symlinks=False)
+    if type == 'f': return entry.is_file(follow_symlinks=False)
     try:
-        if sys.platform[:3] == 'win': raise NotImplementedError
-        pathlist = []
-        search_list = patterns.split(';')
-        for item in search_list:
-            command = 'find %s -name %r' % (root, item)
-            if type:
-                command += ' -type '+type
-            if not recurse:
-                command += ' -maxdepth 1'
-            elif recurse is not True:
-                command += ' -maxdepth %d' % (int(recurse) + 1)
-            if verbose: print(command)
-            p = Popen(command, **popen4)
-            p.stdin.close()
-            pathstr = p.stdout.readlines()
-            p.stdout.close()
-            errind = ['find:','Usage:']
-            if errind[1] in pathstr: #XXX: raise error?
-                if verbose: print("Error: incorrect usage '%s'" % command)
-                return
-            for path in pathstr:
-                path = path.decode()
-                if errind[0] not in path:
-                    path = path.strip()
-                    pathlist.append(os.path.abspath(path))
-    except:
-        folders = False;files = False;links = False
-        if type in ['f']: files = True
-        elif type in ['l']: links = True
-        elif type in ['d']: folders = True
-        else: folders = True;files = True;links = True
-        pathlist = walk(root,patterns,recurse,folders,files,links)
-    return pathlist
+        return _FTYPES[type](entry.stat(follow_symlinks=False).st_mode)
+    except OSError:
+        return False
+
+def _ifind(root, patterns, recurse=True, type=None, workers=None, ordered=True,
+           index=None, visited=None):
+    '''generate paths matching the patterns with a single traversal of root
+
+    Args:
+        root (str): path of top-level directory to search.
+        patterns (str): name or partial name of items to search for.
+        recurse (bool, default=True): if True, recurse downward from *root*.
+        type (str, default=None): a search filter (one of ``'fdlsbc'``).
+        workers (int, default=None): number of threads scanning folders.
+        ordered (bool, default=True): if True, generate in depth-first order.
+        index (str, default=None): path to a search index, or True for default.
+        visited (list, default=None): if given, add ``(dirname, st_mtime_ns)``
+            for each folder that is searched.
+
+    Returns:
+        a generator of absolute string paths.
+
+    Notes:
+        mirrors ``find <root> -name <pattern> [-type <type>] [-maxdepth <n>]``
+        for all of the ``;``-separated patterns at once. Like ``find``, *root*
+        itself is a candidate match, and unreadable directories are skipped.
+        If *index* is given, folder contents are read from the search index
+        (see ``pox._index.listdir``), and only modified folders are scanned.
+    '''
+    match = _matcher(patterns)
+    # depth of the top-level directory's contents is 1 (as in find)
+    if recurse is True: maxdepth = None
+    else: maxdepth = int(recurse) + 1 if recurse else 1
+    top = os.path.abspath(root)
+    try:
+        mode = os.lstat(top).st_mode
+    except OSError:
+        return
+    name = os.path.basename(os.path.normpath(root)) or root
+    if match(name) and (type is None or _FTYPES[type](mode)):
+        yield top
+    if not os.path.isdir(top): return
+    if index:
+        from ._index import listdir
+        def scan(dirname, depth):
+            if visited is not None: _visit(visited, dirname)
+            descend = maxdepth is None or depth < maxdepth
+            matches = []; subdirs = []
+            for name, ftype in listdir(dirname, index):
+                if match(name) and (type is None or type == ftype):
+                    matches.append(os.path.join(dirname, name))
+                if descend and ftype == 'd':
+                    subdirs.append((os.path.join(dirname, name), depth+1))
+            return matches, subdirs
+        yield from _traverse(scan, top, 1, workers, ordered)
+        return
+    def scan(dirname, depth):
+        if visited is not None: _visit(visited, dirname)
+        try:
+            with os.scandir(dirname) as it:
+                entries = list(it)
+        except OSError:
+            return [], []
+        descend = maxdepth is None or depth < maxdepth
+        matches = []; subdirs = []
+        for entry in entries:
+            if match(entry.name) and (type is None or _ftype(entry, type)):
+                matches.append(os.path.join(dirname, entry.name))
+            try:
+                if descend and entry.is_dir(follow_symlinks=False):
+                    subdirs.append((os.path.join(dirname, entry.name), depth+1))
+            except OSError:
+                pass
+        return matches, subdirs
+    yield from _traverse(scan, top, 1, workers, ordered)
+    return
+
+def _visit(visited, dirname):
+    '''add ``(dirname, st_mtime_ns)`` to the list of visited folders'''
+    try:
+        visited.append((dirname, os.stat(dirname).st_mtime_ns))
+    except OSError:
+        pass
 
-# TODO: enable recursion depth
-def walk(root,patterns='*',recurse=True,folders=False,files=True,links=True):
+def _traverse(scan, top, depth=0, workers=None, ordered=True):
+    '''generate results of *scan* for each directory in the tree below *top*
+
+    Args:
+        scan (function): ``scan(dirname, depth)`` returns a tuple of a list of
+            results, and a list of ``(dirname, depth)`` of folders to search.
+        top (str): path of top-level directory to search.
+        depth (int, default=0): the depth of *top*, passed to *scan*.
+        workers (int, default=None): number of threads scanning folders.
+        ordered (bool, default=True): if True, preserve the serial order.
+
+    Returns:
+        a generator of the results from each directory.
+
+    Notes:
+        if workers > 1, directories are scanned concurrently from a shared
+        queue in a thread pool, which hides the latency of each directory
+        read on remote filesystems. Results are produced as directories are
+        completed, unless ``ordered=True``, where all directories are scanned
+        and then results are produced in depth-first order (as if serial).
+    '''
+    if not workers or workers < 2:
+        stack = [(top, depth)]
+        while stack:
+            results, subdirs = scan(*stack.pop())
+            yield from results
+            stack.extend(reversed(subdirs))
+        return
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    pool = ThreadPoolExecutor(max_workers=int(workers))
+    try:
+        tree = {}
+        pending = {pool.submit(scan, top, depth): top}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dirname = pending.pop(future)
+                results, subdirs = future.result()
+                for subdir in subdirs:
+                    pending[pool.submit(scan, *subdir)] = subdir[0]
+                if ordered:
+                    tree[dirname] = (results, [d for (d,_) in subdirs])
+                else:
+                    yield from results
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if not ordered: return
+    # replay the scanned tree in depth-first order
+    stack = [top]
+    while stack:
+        results, subdirs = tree.pop(stack.pop())
+        yield from results
+        stack.extend(reversed(subdirs))
+    return
+
+def walk(root,patterns='*',recurse=True,folders=False,files=True,links=True,
+         exclude=None,workers=None):
     '''walk directory tree and return a list matching the requested pattern
 
     Args:
@@ -319,6 +598,8 @@ def walk(root,patterns='*',recurse=True,folders=False,files=True,links=True):
         folders (bool, default=False): if True, include folders in the results.
         files (bool, default=True): if True, include files in results.
         links (bool, default=True): if True, include links in results.
+        exclude (str, default=None): (partial) name of folders to skip.
+        workers (int, default=None): number of threads used to read folders.
 
     Returns:
         a list of string paths.
@@ -327,72 +608,112 @@ def walk(root,patterns='*',recurse=True,folders=False,files=True,links=True):
         patterns can be specified with basic pattern matching. Additionally,
         multiple patterns can be specified by splitting patterns with a ``;``.
 
+        *recursion* can be specified by recursion depth (*int*), where
+        ``recurse=0`` only searches the contents of *root*. Folders matching
+        *exclude* are pruned from the search, and are neither searched nor
+        included in the results. *exclude* can also be given as a function
+        that takes the path of a folder and returns True if it is excluded.
+
+        if workers > 1, folders are read concurrently by a pool of threads,
+        which can greatly speed up searches on high-latency filesystems
+        (e.g. NFS). The results are the same, and in the same order, as for
+        a serial search.
+
     Examples:
         >>> walk(\'..\', patterns=\'pox*\')
         [\'/Users/foo/pox/pox\', \'/Users/foo/pox/scripts/pox_launcher.py\']
         >>> 
         >>> walk(\'.\', patterns=\'*shutils*;*init*\')
         [\'/Users/foo/pox/pox/shutils.py\', \'/Users/foo/pox/pox/__init__.py\']
+        >>> 
+        >>> walk(\'.\', patterns=\'*.py\', recurse=1, exclude=\'.git;tests\')
+        [\'setup.py\', \'pox/shutils.py\', \'pox/__init__.py\', \'pox/utils.py\']
     '''
-    import fnmatch
-    #create a list by splitting patterns at ';'
-    pattern_list = patterns.split(';')
-    try:
-        _walk = os.walk
-    except AttributeError:
-        _walk = None
-   #print("walking... ")
-    if _walk:
-        results = []
-        for dirname,dirs,items in os.walk(root): #followlinks=False
-            if folders or links:
-                for name in dirs:
-                    fullname = os.path.normpath(os.path.join(dirname,name))
-                    if(folders and os.path.isdir(fullname) and \
-                               not os.path.islink(fullname)) or \
-                      (links and os.path.islink(fullname)):
-                        for pattern in pattern_list:
-                            if fnmatch.fnmatch(name,pattern):
-                                results.append(fullname)
-                                break
-            if files or links:
-                for name in items:
-                    fullname = os.path.normpath(os.path.join(dirname,name))
-                    if(files and os.path.isfile(fullname) and \
-                             not os.path.islink(fullname)) or \
-                      (links and os.path.islink(fullname)):
-                        for pattern in pattern_list:
-                            if fnmatch.fnmatch(name,pattern):
-                                results.append(fullname)
-                                break
-            #block recursion if disallowed
-            if not recurse:
-                dirs[:] = []
-        return results
-    #collect arguments into a bunch
-    class Bunch:
-        def __init__(self, **kwds):
-            self.__dict__.update(kwds)
-    arg = Bunch(recurse=recurse,pattern_list=pattern_list,
-                folders=folders, files=files, links=links, results=[])
-    def visit(arg,dirname,items):
-        #append to arg.results all relevant items
-        for name in items:
-            fullname = os.path.normpath(os.path.join(dirname,name))
-            if(arg.files and os.path.isfile(fullname) and \
-                         not os.path.islink(fullname)) or \
-              (arg.folders and os.path.isdir(fullname) and \
-                           not os.path.islink(fullname)) or \
-              (arg.links and os.path.islink(fullname)):
-                for pattern in arg.pattern_list:
-                    if fnmatch.fnmatch(name,pattern):
-                        arg.results.append(fullname)
-                        break
-        #block recursion if disallowed
-        if not arg.recurse:
-            items[:] = []
-    os.path.walk(root,visit,arg) # removed in python 3.x
-    return arg.results
+    return list(_iwalk(root,patterns,recurse,folders,files,links,exclude,
+                       workers))
+
+def iwalk(root,patterns='*',recurse=True,folders=False,files=True,links=True,
+          exclude=None,workers=None):
+    '''walk directory tree and generate paths matching the requested pattern
+
+    Args:
+        root (str): path of top-level directory to search.
+        patterns (str, default=\'*\'): (partial) name of items to search for.
+        recurse (bool, default=True): if True, recurse downward from *root*.
+        folders (bool, default=False): if True, include folders in the results.
+        files (bool, default=True): if True, include files in results.
+        links (bool, default=True): if True, include links in results.
+        exclude (str, default=None): (partial) name of folders to skip.
+        workers (int, default=None): number of threads used to read folders.
+
+    Returns:
+        a generator of string paths.
+
+    Notes:
+        patterns can be specified with basic pattern matching. Additionally,
+        multiple patterns can be specified by splitting patterns with a ``;``.
+        *recursion* depth and *exclude* are handled as in ``walk``.
+
+        paths are produced in the same order as in ``walk``, however each
+        path is yielded as soon as it is found. The file type of each item
+        is taken from the directory scan, and thus does not require a
+        ``stat`` of each path. If *workers* is given, paths are produced in
+        the order the folders are read, and thus the order may vary.
+    '''
+    return _iwalk(root,patterns,recurse,folders,files,links,exclude,
+                  workers,ordered=False)
+
+def _iwalk(root,patterns='*',recurse=True,folders=False,files=True,links=True,
+           exclude=None,workers=None,ordered=True):
+    '''generate paths matching the requested pattern (see ``iwalk``)'''
+    match = _matcher(patterns)
+    if exclude is None: excluded = None
+    elif callable(exclude): excluded = lambda entry, path: exclude(path)
+    else:
+        _excluded = _matcher(exclude)
+        excluded = lambda entry, path: _excluded(entry.name)
+    #maximum depth of recursion below root (None is unlimited)
+    if recurse is True: maxdepth = None
+    else: maxdepth = int(recurse) if recurse else 0
+    def scan(dirname,depth):
+        try:
+            with os.scandir(dirname) as it:
+                entries = list(it)
+        except OSError:
+            return [],[]
+        #split into dirs and nondirs, as in os.walk (links to dirs are dirs)
+        dirs = []; items = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            (dirs if is_dir else items).append(entry)
+        matches = []; subdirs = []
+        for entry in dirs:
+            fullname = os.path.join(dirname,entry.name)
+            if excluded and excluded(entry,os.path.normpath(fullname)):
+                continue #prune excluded folders
+            is_link = entry.is_symlink()
+            if (folders and not is_link) or (links and is_link):
+                if match(entry.name):
+                    matches.append(os.path.normpath(fullname))
+            if not is_link: #followlinks=False
+                subdirs.append((fullname,depth+1))
+        if files or links:
+            for entry in items:
+                is_link = entry.is_symlink()
+                if (files and not is_link and \
+                          entry.is_file(follow_symlinks=False)) or \
+                   (links and is_link):
+                    if match(entry.name):
+                        matches.append(os.path.normpath(os.path.join(dirname,entry.name)))
+        #block recursion if disallowed, or beyond the maximum depth
+        if maxdepth is None or depth < maxdepth:
+            return matches,subdirs
+        return matches,[]
+    yield from _traverse(scan,root,0,workers,ordered)
+    return
 
 def where(name,path,pathsep=None):
     '''get the full path for the given name string on the given search path.
@@ -443,6 +764,47 @@ def mkdir(path,root=None,mode=None):
         if (err.errno != errno.EEXIST) or (not os.path.isdir(absdir)):
             raise
 
+def shellrun(command,timeout=None):
+    '''run the command in a shell, and get the exit status and output
+
+    Args:
+        command (str): the shell command.
+        timeout (float, default=None): max time (in seconds) to wait.
+
+    Returns:
+        tuple of the int exit status, and the output (stdout and stderr).
+
+    Notes:
+        commands are run by a pool of long-lived shell coprocesses (see
+        ``pox._shell.ShellPool``), so a new shell isn't started for each
+        command. Each command runs in a subshell, in the current directory and
+        with the current ``os.environ``, so changes made by a command (e.g.
+        with ``cd`` or ``export``) don't affect later commands. If the shell is
+        not available (e.g. on Windows), each command is run in a new shell
+        with ``Popen(command, **popen4)``.
+
+        as with ``Popen``, the output includes that of any background jobs
+        started by the command, and shellrun waits until they close their
+        output. If the command doesn't finish within *timeout*, the command
+        is killed, and a ``subprocess.TimeoutExpired`` error is raised.
+
+    Examples:
+        >>> shellrun('echo $HOME')
+        (0, '/Users/foo\\n')
+    '''
+    from ._shell import pool
+    shells = pool()
+    if shells is not None:
+        return shells.run(command, timeout)
+    from subprocess import TimeoutExpired
+    p = Popen(command, **popen4)
+    try:
+        output = p.communicate(timeout=timeout)[0]
+    except TimeoutExpired:
+        p.kill(); p.communicate()
+        raise
+    return p.returncode, output.decode(errors='replace')
+
 def shellsub(command):
     '''parse the given command to be formatted for remote shell invocation
 
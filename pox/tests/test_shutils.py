@@ -14,7 +14,7 @@ def test_shutils():
     '''script to test all shutils functions'''
     from pox import shelltype, homedir, rootdir, sep, mkdir, walk, where, env, \
                     username, minpath, which, which_python, find, shellsub, \
-                    expandvars, __version__ as version
+                    expandvars, iwalk, whereis, rmtree, rmtree_wait, __version__ as version
 
    #print('testing shelltype...')
     shell = shelltype()
@@ -50,6 +50,23 @@ def test_shutils():
    #print('cleaning up...')
     os.removedirs(newdir)
 
+   #print('testing rmtree...')
+    mkdir(newdir)
+    with open(sep().join([newdir,'test.txt']), 'w') as f:
+        f.write('test')
+    counts = rmtree(newdir.split(sep())[0], workers=2)
+    assert counts == dict(files=1, dirs=2, bytes=4)
+    assert not os.path.exists(newdir.split(sep())[0])
+    from pox import _disk
+    mkdir(newdir)
+    rmtree(newdir.split(sep())[0], self=False, background=True)
+    assert os.listdir(newdir.split(sep())[0]) == []
+    trash = list(_disk._trashdirs.values())
+    rmtree(newdir.split(sep())[0], background=True)
+    assert not os.path.exists(newdir.split(sep())[0])
+    assert rmtree_wait(timeout=10)
+    assert trash and not any(os.path.exists(i) for i in trash)
+
    #print('testing walk...')
    #print(walk('/usr/local','*',recurse=False,folders=True,files=False))
     folders = walk(rootdir(),'*',recurse=False,folders=True,files=False)
@@ -57,6 +74,11 @@ def test_shutils():
 ### assert all(not os.path.isfile(folder) for folder in folders)
     home = walk(homedir()+sep()+os.pardir, username(), False, True)[0]
     assert home == homedir()
+    assert next(iwalk(homedir()+sep()+os.pardir, username(), False, True)) == home
+    x = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert walk(x,'*.py',recurse=0) == walk(x,'*.py',exclude='tests')
+    assert len(walk(x,'*.py',recurse=1)) > len(walk(x,'*.py',recurse=0))
+    assert walk(x,'*.py',workers=4) == walk(x,'*.py')
 
    #print('testing where...')
     shells = walk(home,'.bashrc',recurse=0)
@@ -85,6 +107,13 @@ def test_shutils():
     python = 'python' if which('python') else 'python3'
     assert which(python).endswith((python,'python.exe'))
     assert which(python) in which(python,all=True)
+    assert which('ACSDAGHQSBFCASDCOMAOCMQOMCQWMOCQOMCOMQRCVOMQOCMQORMCQ') == ''
+    assert which('ACSDAGHQSBFCASDCOMAOCMQOMCQWMOCQOMCOMQRCVOMQOCMQORMCQ',ignore_errors=False) == ''
+
+   #print('testing whereis...')
+    assert whereis('ACSDAGHQSBFCASDCOMAOCMQOMCQWMOCQOMCOMQRCVOMQOCMQORMCQ') == ''
+    x = whereis(python,all=True)
+    assert whereis(python) == (x[0] if x else '')
 
    #print('testing find...')
    #print(find('python','/usr/local',type='l'))
@@ -98,6 +127,14 @@ def test_shutils():
             x = [p for p in find('test_shutils.py',x,True,'f') if version in p]
             x = x[0] if x else ''
     if x: assert set(find('__init__*;__main__*;test_*',x,False,'f')) == set(find('*py;*pyc',x,recurse=False))
+    if x: assert find('*py',x,workers=4) == find('*py',x)
+    if x:
+        import tempfile
+        from pox import rmtree
+        tmp = tempfile.mkdtemp()
+        index = os.path.join(tmp, 'index.db')
+        assert find('*py',x,index=index) == find('*py',x,index=index) == find('*py',x)
+        rmtree(tmp, ignore_errors=True)
 
    #print('testing shellsub...')
     command = '${HOME}/bin/which foo("bar")'
@@ -105,6 +142,32 @@ def test_shutils():
    #print(repr(shellsub(command)))
     assert shellsub(command) == '\\${HOME}/bin/which foo\\(\\"bar\\"\\)'
 
+   #print('testing shellrun...')
+    from pox import shellrun
+    if os.name != 'nt':
+        assert shellrun('echo hello; echo world >&2') == (0, 'hello\nworld\n')
+        assert shellrun('exit 3')[0] == 3
+        assert shellrun("printf \"'$x'\"") == (0, "''")
+        cwd = os.getcwd()
+        shellrun('cd %s' % os.path.dirname(cwd))
+        assert shellrun('pwd') == (0, cwd+'\n')
+        shellrun('POX_X=1; export POX_Y=2')
+        assert shellrun('echo "$POX_X$POX_Y"') == (0, '\n')
+        os.environ['POX_Z'] = 'z'
+        try:
+            assert shellrun('echo "$POX_Z"') == (0, 'z\n')
+        finally:
+            del os.environ['POX_Z']
+        assert shellrun('echo "$POX_Z"') == (0, '\n')
+        x = shellrun('(sleep 0.1; echo late) & echo early')
+        assert x == (0, 'early\nlate\n') and shellrun('echo') == (0, '\n')
+        from subprocess import TimeoutExpired
+        try:
+            shellrun('sleep 5', timeout=0.1)
+            assert False
+        except TimeoutExpired:
+            pass
+
     return
 
 
@@ -15,7 +15,8 @@ def test_utils():
     '''script to test all utils functions'''
     from pox import pattern, getvars, expandvars, convert, replace, \
                     index_join, findpackage, remote, parse_remote, \
-                    select, selectdict, env, homedir, username
+                    select, selectdict, env, homedir, username, wait_for, \
+                    wait_for_all, disk_used
 
    #print('testing pattern...')
     assert pattern(['PYTHON*','DEVELOPER']) == 'PYTHON*;DEVELOPER'
@@ -46,6 +47,14 @@ def test_utils():
     assert expandvars('${DV_DIR}/${QAZWERFDSXCV_VERSION}',secondref=bogusdict) == \
            expandvars('${DV_DIR}/${QAZWERFDSXCV_VERSION}',bogusdict,os.environ)
     assert expandvars('${%s}/stuff' % _home) == ''.join([homedir(), '/stuff'])
+    from pox import expandvars_all
+    x = ['${MIKE_DIR}/${DV_DIR}/stuff', '$DUMMY_STUFF', '$ASDFQWEGQVQEG']
+    assert expandvars_all(x,bogusdict) == [expandvars(i,bogusdict) for i in x]
+    try:
+        expandvars('$A',{'A':'$B','B':'${A}'})
+        assert False
+    except ValueError:
+        pass
 
    #print('testing convert...')
     source = 'test.txt'
@@ -54,6 +63,10 @@ def test_utils():
     f.close()
     assert convert(source,'mac',verbose=False) == convert(source,verbose=False)
     assert convert(source,'foo',verbose=False) > 0
+    assert convert([source,source+'.bak'],verbose=False,workers=2) == 1
+    f = open(source,'rb')
+    assert f.read() == ('this is a test file.'+os.linesep).encode()
+    f.close()
 
    #print('testing replace...')
     replace(source,{' is ':' was '})
@@ -61,16 +74,105 @@ def test_utils():
     f = open(source,'r')
     assert f.read().rstrip() == 'this was a test.'
     f.close()
+    from pox import replace_files
+    replace_files([source],{r'\bwas':'is',r'\bis':'was',r'(t\w+)\.':r'\1 file.'})
+    f = open(source,'r')
+    assert f.read().rstrip() == 'this is a test file.'
+    f.close()
+    with open(source,'w') as f:
+        f.write('foo aab xy')
+    replace_files([source],{'foo':'bar',r'(\w)\1':'X',r'x(y)':r'\1'})
+    with open(source,'r') as f:
+        assert f.read() == 'bar Xb y'
+    with open(source,'w') as f:
+        f.write('a b')
+    replace_files([source],{'(?i)a':'b','b':'c'})
+    with open(source,'r') as f:
+        assert f.read() == 'b c'
+    x = [source+'.1', source+'.2']
+    replace_files([source,source],{'c':lambda m: 'd'},x,workers=2)
+    for i in x:
+        with open(i,'r') as f:
+            assert f.read() == 'b d'
+        os.remove(i)
+    import pox.utils
+    size = pox.utils.MMAP_SIZE
+    try: # memory-mapped, in sequence, and as text
+        for (text, sub) in (('bar Xbb', {'(?i)B':'c',r'(\w)\1':'X'}),
+                            ('bar Xbb', {'(?i)B':'c'}),
+                            ('a\x1cb q', {r'\s':'_','q':'r'}),
+                            ('bar \u00e9\u00e9', {r'\w\b':'_'})):
+            x = []
+            for pox.utils.MMAP_SIZE in (0, size):
+                with open(source,'w',encoding='utf-8') as f:
+                    f.write(text)
+                replace_files([source],sub,encoding='utf-8')
+                with open(source,'r',encoding='utf-8') as f:
+                    x.append(f.read())
+            assert x[0] == x[1] != text
+    finally:
+        pox.utils.MMAP_SIZE = size
+
+   #print('testing wait_for...')
+    wait_for(source,sleep=0.1,tries=1)
+    assert wait_for_all([source],sleep=0.1,tries=1) == [source]
+    assert wait_for_all('test.*',sleep=0.1,tries=1) == [source]
     os.remove(source)
+    try:
+        wait_for(source,sleep=0.01,tries=2)
+        assert False
+    except IOError:
+        pass
 
    #print('testing index_join...')
     fl = ['begin ','hello ','world ','string ']
     assert index_join(fl,'hello ','world ') == 'hello world '
+    from pox import SequenceIndex
+    x = SequenceIndex(fl)
+    assert index_join(x,'hello ','world ') == 'hello world '
+    assert index_join(x,'world ','hello ',sequential=False) == 'world string '
+    assert x.slice('begin ','string ',inclusive=True) == slice(0,4,1)
+    from pox import index_join_file
+    source = 'test.txt'
+    with open(source,'w') as f:
+        f.write('\n'.join(fl))
+    assert index_join_file(source,'hello ','world ') == 'hello \nworld \n'
+    assert index_join_file(source,'world ','nothing') == 'world \nstring '
+    os.remove(source)
+
+   #print('testing disk_used...')
+    x = os.path.dirname(os.path.abspath(__file__))
+    assert disk_used(x) > 0
+    tree = disk_used(x,tree=True)
+    assert tree[x] == disk_used(x,recurse=True) == disk_used(x,True,workers=4)
+    assert tree[x] == max(tree.values())
+    assert disk_used(x+os.sep,tree=True) == tree
+    import tempfile
+    from pox import rmtree
+    tmp = tempfile.mkdtemp()
+    index = os.path.join(tmp, 'index.db')
+    assert disk_used(x,index=index) == disk_used(x,index=index) == tree[x]
+
+   #print('testing CacheDir...')
+    from pox import CacheDir
+    cache = CacheDir(os.path.join(tmp,'cache'), budget='64K')
+    for i in range(4):
+        with open(os.path.join(cache.path,str(i)), 'wb') as f:
+            f.write(b'x' * 30000)
+        evicted = cache.add(str(i))
+        assert cache.size <= cache.budget
+    assert '0' not in cache and '3' in cache
+    assert not os.path.exists(os.path.join(cache.path,'0'))
+    rmtree(tmp, ignore_errors=True)
 
    #print('testing findpackage...')
     assert not findpackage('python','aoskvaosvoaskvoak',all=True,verbose=False,recurse=False)
     p = findpackage('lib/python*',env('HOME',all=False),all=False,verbose=False,recurse=1)
     if p: assert 'lib/python' in p
+    x = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert findpackage('pox',verbose=False) == x
+    assert findpackage('tests',x,all=True,verbose=False) == \
+           findpackage('tests',x,all=True,verbose=False) == [x+os.sep+'tests']
 
    #print('testing remote...')
     myhost = 'login.cacr.caltech.edu'
@@ -98,10 +200,23 @@ def test_utils():
     assert select(test,minimum=True) == ['4', '8']
     assert select(test,reverse=True,all=False) == 'seven'
     assert select(test,counter='/',all=False) == '9/81'
+    assert test[0] == 'zero'
+    assert select(test,counter='e',top=3) == ['three', 'seven', 'zero']
+    assert select(test,key=len,minimum=True,all=False) == '4'
     test = [[1,2,3],[4,5,6],[1,3,5]]
     assert select(test) == test
     assert select(test,counter=3) == [test[0], test[-1]]
     assert select(test,counter=3,minimum=True) == [test[1]]
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None:
+        x = np.array(test)
+        assert select(x,counter=3).tolist() == [test[0], test[-1]]
+        assert select(x,counter=3,top=1,minimum=True).tolist() == [test[1]]
+        x = np.array([0.5,1.5,0.5])
+        assert select(x,counter=0.5).dtype == x.dtype
 
    #print('testing selectdict...')
     x = {'MIKE_VERSION': '1.0', 'DUMMY_VERSION': '6.9'}
@@ -109,6 +224,23 @@ def test_utils():
     x = {'DUMMY_STUFF': '/a/b', 'QAZWERFDSXCV_STUFF': '${DV_DIR}/pythia-${QAZWERFDSXCV_VERSION}/stuff'}
     assert selectdict(bogusdict,counter='/') == x
     assert len(selectdict(bogusdict,counter='/',all=False)) == 1
+    assert sorted(selectdict(bogusdict,counter='/',keys=True)) == sorted(x)
+    assert selectdict({1:'a/b',2:'a/b'},counter='/',all=False) == {1:'a/b'}
+
+   #print('testing pythons...')
+    from pox import pythons
+    path, cache = os.environ.get('PATH'), os.environ.get('POX_CACHE_DIR')
+    os.environ['PATH'] = os.path.dirname(sys.executable)
+    os.environ['POX_CACHE_DIR'] = tmp = tempfile.mkdtemp()
+    try:
+        x = pythons()
+        assert x == pythons()
+        if x: assert tuple(sys.version_info[:3]) in [v[1] for v in x.values()]
+    finally:
+        os.environ['PATH'] = path
+        if cache is None: del os.environ['POX_CACHE_DIR']
+        else: os.environ['POX_CACHE_DIR'] = cache
+        rmtree(tmp, ignore_errors=True)
     return
 
 
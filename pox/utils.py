@@ -12,8 +12,9 @@ higher-level shell utilities for user environment and filesystem exploration
 """
 
 import os
+import functools
 from . import shutils
-from ._disk import kbytes, disk_used
+from ._disk import kbytes, disk_used, CacheDir
 
 #NOTE: broke backward compatibility January 17, 2014
 #      seperator --> separator
@@ -56,34 +57,101 @@ def expandvars(string,ref=None,secondref={}):
         >>> 
         >>> expandvars(\'found:: $PYTHONPATH\', ref={})
         \'found:: $PYTHONPATH\'
+
+    Notes:
+        the values of variables are also expanded. A ValueError is raised if
+        a variable refers to itself (e.g. ``{\'A\':\'$B\', \'B\':\'$A\'}``).
+        To expand many strings with the same lookup variables, use
+        ``expandvars_all``.
     """
-    if ref is None: ref = os.environ
-    refdict = {}
-    refdict.update(secondref)
-    refdict.update(ref)
-    global _varprog
     if '$' not in string:
         return string
+    return _expander(ref, secondref)(string)
+
+def expandvars_all(strings,ref=None,secondref={}):
+    """expand shell variables in each of the given strings
+
+    Args:
+        strings (list(str)): a list of strings with shell variables.
+        ref (dict(str), default=None): a dict of lookup variables.
+        secondref (dict(str), default={}): a failover reference dict.
+
+    Returns:
+        list of strings with the selected shell variables substituted.
+
+    Notes:
+        as in ``expandvars``, however each variable is only looked up and
+        expanded once, for all of the given strings.
+    """
+    expand = _expander(ref, secondref)
+    return [expand(string) for string in strings]
+
+@functools.lru_cache(maxsize=1024)
+def _template(string):
+    """split the string into literal text and variables
+
+    Args:
+        string (str): a string with shell variables.
+
+    Returns:
+        tuple of ``(texts, names, raws)``, where *names* are the variable
+        names, *raws* are the variables as they appear in the string (e.g.
+        ``'${var}'``), and *texts* are the literal text around the variables.
+    """
+    global _varprog
     if not _varprog:
         import re
         _varprog = re.compile(r'\$(\w+|\{[^}]*\})')
-    i = 0
-    while True:
-        m = _varprog.search(string, i)
-        if not m:
-            break
-        i, j = m.span(0)
-        name = m.group(1)
-        if name[:1] == '{' and name[-1:] == '}':
-            name = name[1:-1]
-        if name in refdict:
-            tail = string[j:]
-            string = string[:i] + expandvars(refdict[name], ref, secondref)
-            i = len(string)
-            string = string + tail
-        else:
-            i = j
-    return string
+    parts = _varprog.split(string)
+    names = parts[1::2]
+    raws = tuple('$' + name for name in names)
+    names = tuple(name[1:-1] if name[:1] == '{' else name for name in names)
+    return tuple(parts[::2]), names, raws
+
+def _expander(ref=None, secondref={}):
+    """get a function that expands the shell variables in a string
+
+    Args:
+        ref (dict(str), default=None): a dict of lookup variables.
+        secondref (dict(str), default={}): a failover reference dict.
+
+    Returns:
+        a function ``expand(string)``, that returns the expanded string.
+
+    Notes:
+        the expanded value of each variable is saved, and reused in later
+        calls to the function. Thus, the function should not be used after
+        the lookup variables have been modified.
+    """
+    if ref is None: ref = os.environ
+    values = {} # {name: expanded value, or None if not found}
+    active = [] # names of the variables currently being expanded
+    def expand(string):
+        if '$' not in string:
+            return string
+        texts, names, raws = _template(string)
+        parts = [texts[0]]
+        for (name, raw, text) in zip(names, raws, texts[1:]):
+            if name in values:
+                value = values[name]
+            else:
+                if name in ref: value = ref[name]
+                elif name in secondref: value = secondref[name]
+                else: value = None
+                if value is not None:
+                    if name in active:
+                        cycle = ' -> '.join(active[active.index(name):] + [name])
+                        raise ValueError("variable refers to itself: %s" % cycle)
+                    active.append(name)
+                    try:
+                        value = expand(value)
+                    finally:
+                        active.pop()
+                values[name] = value
+            parts.append(raw if value is None else value)
+            parts.append(text)
+        return ''.join(parts)
+    return expand
 
 #NOTE: broke backward compatibility January 17, 2014
 #      vdict --> ref
@@ -123,7 +191,7 @@ def getvars(path,ref=None,sep=None):
                 ndict[key] = os.environ[key]
     return ndict
 
-def convert(files,platform=None,pathsep=None,verbose=True):
+def convert(files,platform=None,pathsep=None,verbose=True,workers=None):
     '''convert text files to given platform type
 
     Ensure given files use the appropriate ``os.linesep`` and other formatting.
@@ -133,16 +201,23 @@ def convert(files,platform=None,pathsep=None,verbose=True):
         platform (str, default=None): platform name as in ``os.name``.
         pathsep (str, default=None): the path separator string.
         verbose (bool, default=True): if True, print debug statements..
+        workers (int, default=None): number of threads converting files.
 
     Returns:
         0 if converted, otherwise return 1.
+
+    Notes:
+        *files* can be given as a list, or as a string of filenames joined
+        by *pathsep*. Each file is converted in chunks, written to a temporary
+        file, and then atomically moved into place. Files that already have
+        the appropriate line endings are not rewritten. If workers > 1, files
+        are converted concurrently by a pool of threads.
     '''
     if not platform: platform = os.name
     if not pathsep: pathsep = os.pathsep
-    MAC = '\r'
-    WIN = '\r\n'
-    LIN = '\n'
-    linesep = [WIN,MAC,LIN]
+    MAC = b'\r'
+    WIN = b'\r\n'
+    LIN = b'\n'
     #os.name ==> ['posix','nt','os2','mac','ce','riscos']
     if platform in ['linux2','linux','unix','lin','posix','riscos']: #???
         newlinesep = LIN
@@ -153,23 +228,96 @@ def convert(files,platform=None,pathsep=None,verbose=True):
     else:
         if verbose: print("Error: Platform '%s' not recognized" % platform)
         return 2 # Error 2: platform not recognized
-    allconverted = 0 # Success
-    for file in files.split(pathsep):
+    if isinstance(files, str): files = files.split(pathsep)
+    def _convert(file):
         try:
-            infile = open(file, 'r')
-            filestring = infile.read()
-            infile.close()
-            for i in linesep:
-                filestring = filestring.replace(i, newlinesep)
-            outfile = open(file, 'w')
-            outfile.write(filestring)
-            outfile.close()
-            if verbose: print("Converted '%s' to '%s' format" % (file,platform))
-        except:
+            return _convert_newlines(file, newlinesep)
+        except Exception:
+            return None
+    if workers and workers > 1 and len(files) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=int(workers)) as pool:
+            results = list(pool.map(_convert, files))
+    else:
+        results = [_convert(file) for file in files]
+    allconverted = 0 # Success
+    for file, converted in zip(files, results):
+        if converted is None:
             if verbose: print("File conversion failed for '%s'" % (file))
             allconverted = 1 # Error 1: file conversion failed
+        elif verbose:
+            if converted:
+                print("Converted '%s' to '%s' format" % (file,platform))
+            else:
+                print("File '%s' is in '%s' format" % (file,platform))
     return allconverted
 
+# size of the chunks read when streaming files (in bytes)
+CHUNKSIZE = 1 << 20
+
+def _convert_newlines(file, newline=b'\n', chunksize=None):
+    '''convert all line endings in the given file to the given newline
+
+    Args:
+        file (str): path to the file.
+        newline (bytes, default=b'\n'): the new line ending.
+        chunksize (int, default=None): bytes read at a time [default: 1 MB].
+
+    Returns:
+        True if the file was converted, or False if no change was needed.
+
+    Notes:
+        line endings of ``\r\n``, ``\r``, and ``\n`` are converted. The file is
+        read in chunks, and only if a chunk changes is a temporary file created
+        (beside the file), which then atomically replaces the file. A ``\r\n``
+        split across chunks is handled by holding back a trailing ``\r``.
+    '''
+    import shutil
+    import tempfile
+    chunksize = chunksize or CHUNKSIZE
+    file = os.path.realpath(file)
+    out = None; tmp = None
+    try:
+        with open(file, 'rb') as infile:
+            offset = 0; carry = b''
+            while True:
+                chunk = infile.read(chunksize)
+                data = carry + chunk
+                if not chunk: carry = b''
+                elif data.endswith(b'\r'): # may be followed by '\n'
+                    data, carry = data[:-1], b'\r'
+                else: carry = b''
+                new = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+                if newline != b'\n': new = new.replace(b'\n', newline)
+                if out is None and new != data: # first change, so copy prefix
+                    fd, tmp = tempfile.mkstemp(prefix='.'+os.path.basename(file),
+                                               dir=os.path.dirname(file))
+                    out = os.fdopen(fd, 'wb')
+                    with open(file, 'rb') as prefix:
+                        _copy(prefix, out, offset)
+                if out is not None: out.write(new)
+                offset += len(data)
+                if not chunk: break
+        if out is None: return False
+        out.close()
+        shutil.copymode(file, tmp)
+        os.replace(tmp, file)
+        tmp = None
+        return True
+    finally:
+        if out is not None: out.close()
+        if tmp is not None: os.remove(tmp)
+
+def _copy(infile, outfile, size, chunksize=None):
+    '''copy *size* bytes from the start of *infile* to *outfile*'''
+    chunksize = chunksize or CHUNKSIZE
+    while size > 0:
+        data = infile.read(min(chunksize, size))
+        if not data: break
+        outfile.write(data)
+        size -= len(data)
+    return
+
 def replace(file,sub={},outfile=None):
     '''make text substitutions given by *sub* in the given file
 
@@ -184,6 +332,7 @@ def replace(file,sub={},outfile=None):
     Notes:
         ``replace`` uses regular expressions, thus a pattern may be used as
         *old* text. ``replace`` can fail if order of substitution is important.
+        To make the substitutions in many files, use ``replace_files``.
     '''
     #XXX: use OrderedDict instead... would enable ordered substitutions
     if outfile == None: outfile = file
@@ -198,6 +347,330 @@ def replace(file,sub={},outfile=None):
     output.close()
     return
 
+def replace_files(files,sub={},outfiles=None,workers=None,encoding=None):
+    '''make text substitutions given by *sub* in each of the given files
+
+    Args:
+        files (list(str)): paths to the original files.
+        sub (dict(str), default={}: dict of string replacements ``{old:new}``.
+        outfiles (list(str), default=None): if given, don't overwrite files.
+        workers (int, default=None): number of processes substituting files.
+        encoding (str, default=None): the text encoding of the files.
+
+    Returns:
+        None
+
+    Notes:
+        like ``replace``, a pattern may be used as *old* text. However, the
+        substitutions are compiled once into a single regular expression, and
+        are made in a single pass over each file. At each position in the text,
+        the first pattern in *sub* that matches is used, and replaced text is
+        not searched again (unlike ``replace``, which makes one pass for each
+        pattern). Files are written to a temporary file, then atomically moved
+        into place, and line endings are preserved.
+
+        files larger than ``MMAP_SIZE`` are memory-mapped and searched as bytes
+        (with the patterns encoded with *encoding*), and the substituted text
+        is streamed to the output, if all patterns are literal strings (i.e.
+        without regex special characters), no replacement is a function, and
+        the file is ASCII (or UTF-8, if *encoding* is UTF-8). Otherwise, the
+        file is read into memory and searched as text, so the result doesn't
+        depend on the size of the file. If workers > 1, files are processed
+        concurrently by a pool of processes, unless *sub* can't be pickled
+        (e.g. a replacement is a lambda), where files are processed in turn.
+    '''
+    if isinstance(files, str): files = [files]
+    if outfiles is None: outfiles = files
+    if len(outfiles) != len(files):
+        raise ValueError("files and outfiles must be the same length")
+    items = tuple(sub.items())
+    args = [(file, outfile, items, encoding) \
+            for (file, outfile) in zip(files, outfiles)]
+    if workers and workers > 1 and len(files) > 1 and _picklable(items):
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=int(workers)) as pool:
+            list(pool.map(_replace_file, *zip(*args)))
+    else:
+        for arg in args: _replace_file(*arg)
+    return
+
+def _picklable(obj):
+    '''check if obj can be pickled (e.g. sent to a process pool)'''
+    import pickle
+    try:
+        pickle.dumps(obj)
+    except Exception:
+        return False
+    return True
+
+# files larger than this size (in bytes) are memory-mapped by replace_files
+MMAP_SIZE = 64 << 20
+
+def _substitution(items, binary=False):
+    '''compile the substitutions ``((old,new),...)`` to a single function
+
+    Args:
+        items (tuple): tuple of ``(old, new)`` regex and replacement pairs.
+        binary (str, default=False): if given, the encoding used for bytes.
+
+    Returns:
+        tuple of ``(regex, repl)``, where regex is the compiled regex, and repl
+        gets the replacement for each match of the regex (as in ``re.sub``).
+
+    Notes:
+        each pattern is wrapped in a named group (i.e. ``_0``, ``_1``, ...), so
+        the pattern for each match is found by the last group matched, and the
+        group references in each pattern and replacement are renumbered to
+        match. Runs of literal strings (with literal replacements) share a
+        group, and are replaced using a dict. If all patterns are literal
+        strings, repl is the dict, and regex has a single group. If the
+        patterns can't be combined (e.g. they use different flags, or repeat
+        a group name), or there is only one pattern, regex is None, and repl
+        is a list of the compiled patterns and replacements, which are still
+        searched in one pass (see ``_leftmost``).
+    '''
+    key = (items, binary)
+    if key in _substitutions: return _substitutions[key]
+    import re
+    def encode(x):
+        return x.encode(binary) if binary and isinstance(x, str) else x
+    patterns = [re.compile(encode(old)) for (old, _) in items]
+    news = [encode(new) for (_, new) in items]
+    flags = set(pattern.flags for pattern in patterns)
+    try:
+        if len(flags) > 1: raise re.error('patterns use different flags')
+        if len(patterns) == 1: raise re.error('only one pattern')
+        ref = re.compile(encode(r'\\(?:g<(\w+)>|(0[0-7]{0,2}|[0-7]{3})|(\d\d?)|(.))'),
+                         re.DOTALL)
+        # a backreference (or conditional) to a group, or a character set
+        backref = re.compile(encode(r'\\(?:[0-7]{3}|([1-9][0-9]?)|.)|' + \
+                  r'\(\?\(([0-9]+)\)|\[\^?\]?(?:\\.|[^\]\\])*\]'), re.DOTALL)
+        def renumber(m, offset):
+            number = m.group(1) or m.group(2)
+            if number is None: return m.group(0)
+            if binary: number = number.decode()
+            number = int(number) + offset
+            if m.group(1) and number > 99: raise re.error('too many groups')
+            return encode(('\\%d' if m.group(1) else '(?(%d)') % number)
+        empty = encode('')
+        literal = not any(f & (re.I | re.X) for f in flags)
+        group = 0; sources = []; repls = []; run = None
+        for ((old, _), pattern, new) in zip(items, patterns, news):
+            if literal and isinstance(old, str) and not callable(new) and \
+               not any(c in '.^$*+?{}[]\\|()' for c in old + str(new)):
+                if run is None: # start a run of literal strings
+                    run = {}; group += 1
+                    sources.append(pattern.pattern)
+                    repls.append(lambda m, run=run: run[m.group()])
+                else: sources[-1] += encode('|') + pattern.pattern
+                run.setdefault(pattern.pattern, new)
+                continue
+            run = None
+            group += 1 # the group for the pattern, with its groups following
+            if callable(new): # give the function a match with its own groups
+                new = lambda m, p=pattern, f=new: f(p.match(m.string, m.start()))
+            elif ref.search(new) is not None: # parse the template, once
+                texts = []; refs = []; text = []; pos = 0
+                for m in ref.finditer(new):
+                    text.append(new[pos:m.start()]); pos = m.end()
+                    name = m.group(1) or m.group(3)
+                    if binary and name is not None: name = name.decode()
+                    if name is None: # expand escapes (e.g. '\n') as in re
+                        text.append(re.sub(empty, m.group(0), empty))
+                        continue
+                    texts.append(empty.join(text)); text = []
+                    refs.append(int(name)+group if name.isdigit() else name)
+                text.append(new[pos:])
+                texts.append(empty.join(text))
+                if refs:
+                    new = lambda m, t=texts, r=refs: empty.join( \
+                        [t[0]] + [x for (g, s) in zip(r, t[1:]) \
+                                  for x in (m.group(g) or empty, s)])
+                else: new = texts[0]
+            source = pattern.pattern
+            if pattern.groups: # renumber the group references in the pattern
+                source = backref.sub(lambda m: renumber(m, group), source)
+            sources.append(source)
+            repls.append(new)
+            group += pattern.groups
+        if run is not None and len(sources) == 1: # only literal strings
+            regex = re.compile(encode('(') + sources[0] + encode(')'))
+            _substitutions[key] = regex, run
+            return regex, run
+        template = encode('|').join(encode('(?P<_%d>' % i) + source + \
+                                    encode(')') for (i, source) \
+                                    in enumerate(sources)) or encode('(?!)')
+        # look ahead for the first character, so the search can skip ahead
+        first = [_first(old) for (old, _) in items]
+        if first and None not in first:
+            template = encode('(?=[%s])(?:' % ''.join(first)) + template + \
+                       encode(')')
+        regex = re.compile(template, flags.pop() if flags else 0)
+        def repl(match):
+            new = repls[int(match.lastgroup[1:])]
+            return new(match) if callable(new) else new
+    except re.error: # substitute each pattern in sequence
+        regex, repl = None, list(zip(patterns, news))
+    _substitutions[key] = regex, repl
+    return regex, repl
+
+# compiled substitutions, as {(items, binary): (regex, repl)}
+_substitutions = {}
+
+def _first(pattern):
+    '''get a character set for the first character of any match of *pattern*
+
+    Args:
+        pattern (str): a regular expression.
+
+    Returns:
+        string contents of a character set (e.g. ``'Hh'`` for ``'[Hh]ello'``),
+        or None if the first character of a match can't be simply determined.
+    '''
+    import re
+    if not pattern or '|' in pattern: return None
+    if pattern[0] == '(': # a group, that can't be skipped
+        if any(')'+c in pattern for c in '*?{'): return None
+        group = re.match(r'\((?:\?:|\?P<\w+>)?', pattern)
+        if pattern.startswith('(?') and group.end() == 1: return None
+        return _first(pattern[group.end():])
+    if pattern[0] == '[':
+        i = 1
+        if pattern[i:i+1] == '^': return None
+        if pattern[i:i+1] == ']': i += 1
+        while i < len(pattern) and pattern[i] != ']':
+            i += 2 if pattern[i] == '\\' else 1
+        if i >= len(pattern) or '[' in pattern[1:i]: return None
+        first, i = pattern[1:i], i+1
+    elif pattern[0] == '\\':
+        first, i = pattern[:2], 2
+        if first[1:].isalnum() and first[1:] not in 'wdsWDS': return None
+    elif pattern[0] in '.^$*+?{}()':
+        return None
+    else:
+        first, i = re.escape(pattern[0]), 1
+    if pattern[i:i+1] in ('*', '?', '{'): return None
+    return first
+
+def _substitute(regex, repl, text):
+    '''substitute in *text*, using ``(regex, repl)`` from ``_substitution``'''
+    if regex is None:
+        if len(repl) == 1:
+            return repl[0][0].sub(repl[0][1], text)
+        return text[:0].join(_scan(regex, repl, text))
+    if isinstance(repl, dict): # replace the matched strings in bulk
+        parts = regex.split(text)
+        parts[1::2] = map(repl.__getitem__, parts[1::2])
+        return text[:0].join(parts)
+    return regex.sub(repl, text)
+
+def _scan(regex, repl, text):
+    '''generate the parts of the substituted *text* (as in ``_substitute``)'''
+    if regex is None:
+        matches = _leftmost(repl, text)
+    else:
+        matches = ((match, repl) for match in regex.finditer(text))
+    slash = b'\\' if isinstance(text[:0], bytes) else '\\'
+    i = 0
+    for (match, new) in matches:
+        yield text[i:match.start()]
+        if isinstance(new, dict): yield new[match.group()]
+        elif callable(new): yield new(match)
+        else: yield match.expand(new) if slash in new else new
+        i = match.end()
+    yield text[i:]
+
+def _leftmost(patterns, text):
+    '''generate ``(match, new)`` for the leftmost match of the patterns
+
+    Args:
+        patterns (list): list of ``(pattern, new)``, with compiled patterns.
+        text (str): the text to search.
+
+    Returns:
+        a generator of the non-overlapping matches, and their replacements.
+
+    Notes:
+        matches are found in one pass, as with an alternation of the patterns,
+        so at each position the first pattern that matches is used.
+    '''
+    found = [None] * len(patterns) # the next match of each pattern
+    pos = 0
+    while pos <= len(text):
+        best = None
+        for (i, (pattern, new)) in enumerate(patterns):
+            match = found[i]
+            if match is None or (match and match.start() < pos):
+                match = found[i] = pattern.search(text, pos) or False
+            if match and (best is None or match.start() < best[0].start()):
+                best = (match, new)
+        if best is None: return
+        yield best
+        match = best[0]
+        pos = match.end() + (match.end() == match.start())
+    return
+
+def _bytewise(items, encoding, data):
+    '''check if substituting in the encoded *data* matches the decoded text'''
+    import re
+    import codecs
+    try: # an ASCII-compatible encoding
+        if codecs.encode('a\n', encoding) != b'a\n': return False
+    except LookupError:
+        return False
+    # only literal strings match the same in bytes (e.g. not '\\s' or '.')
+    for (old, new) in items:
+        if callable(new) or not isinstance(old, str): return False
+        if any(c in '.^$*+?{}[]\\|()' for c in old): return False
+        try:
+            old.encode(encoding); str(new).encode(encoding)
+        except UnicodeError:
+            return False
+    if re.search(b'[\x80-\xff]', data) is None: # ASCII text
+        return True
+    return codecs.lookup(encoding).name == 'utf-8'
+
+def _replace_file(file, outfile=None, items=(), encoding=None):
+    '''make the substitutions ``((old,new),...)`` in the given file'''
+    import tempfile
+    import shutil
+    if outfile is None: outfile = file
+    outfile = os.path.realpath(outfile)
+    fd, tmp = tempfile.mkstemp(prefix='.'+os.path.basename(outfile),
+                               dir=os.path.dirname(outfile))
+    try:
+        binary = None
+        if os.path.getsize(file) >= MMAP_SIZE:
+            import mmap
+            import locale
+            binary = encoding or locale.getpreferredencoding(False)
+            with open(file, 'rb') as input, \
+                 mmap.mmap(input.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if not _bytewise(items, binary, data): binary = None
+        if binary is None:
+            regex, repl = _substitution(items)
+            with open(file, 'r', encoding=encoding, newline='') as input:
+                filestring = input.read()
+            filestring = _substitute(regex, repl, filestring)
+            with os.fdopen(fd, 'w', encoding=encoding, newline='') as output:
+                fd = None
+                output.write(filestring)
+        else: # memory-map, and stream the substituted text
+            regex, repl = _substitution(items, binary)
+            with open(file, 'rb') as input, os.fdopen(fd, 'wb') as output:
+                fd = None
+                with mmap.mmap(input.fileno(), 0,
+                               access=mmap.ACCESS_READ) as data:
+                    for part in _scan(regex, repl, data):
+                        output.write(part)
+        shutil.copymode(file, tmp)
+        os.replace(tmp, outfile)
+        tmp = None
+    finally:
+        if fd is not None: os.close(fd)
+        if tmp is not None: os.remove(tmp)
+    return
+
 def index_slice(sequence,start,stop,step=1,sequential=False,inclusive=False):
     '''get the slice for a given sequence
 
@@ -215,16 +688,22 @@ def index_slice(sequence,start,stop,step=1,sequential=False,inclusive=False):
 
     Returns:
         slice corresponding to given *start*, *stop*, and *step*.
+
+    Notes:
+        the sequence can also be a ``SequenceIndex``, which is faster when
+        many slices are taken from the same sequence.
     '''
+    if isinstance(sequence, SequenceIndex):
+        return sequence.slice(start,stop,step,sequential,inclusive)
     if start in sequence:
         begin = sequence.index(start)
     else: begin = None
-    if sequential: here = None
-    else: here = begin
-    if stop in sequence[here:]:
-        end = sequence[here:].index(stop)
-        if here: end += here
-    else: end = None
+    if sequential: here = 0
+    else: here = begin or 0
+    try:
+        end = sequence.index(stop, here)
+    except ValueError:
+        end = None
     if inclusive and end != None: end += 1
     return slice(begin,end,step)
 
@@ -244,13 +723,199 @@ def index_join(sequence,start,stop,step=1,sequential=True,inclusive=True):
 
     Returns:
         string produced by slicing the given sequence and joining the elements.
+
+    Notes:
+        the sequence can also be a ``SequenceIndex``, which is faster when
+        many slices are taken from the same sequence.
     '''
     islice = index_slice(sequence,start,stop,step,sequential,inclusive)
+    if isinstance(sequence, SequenceIndex): sequence = sequence.sequence
     return ''.join(sequence[islice])
 
+def index_join_file(file,start,stop,step=1,sequential=True,inclusive=True,
+                    outfile=None,encoding=None):
+    '''get the lines of a file between the given lines, joined as a string
+
+    If *start* is not found in the file, slice from the beginning. If *stop*
+    is not found in the file, slice to the end.
+
+    Args:
+        file (str): path of the file.
+        start (str): line at the start of the slice.
+        stop (str): line at the stop position in the file.
+        step (int, default=1): lines until next member of the slice.
+        sequential (bool, default=True): if True, *start* must preceed *stop*.
+        inclusive (bool, default=True): if True, include *stop* in the slice.
+        outfile (str, default=None): if given, write the slice to *outfile*.
+        encoding (str, default=None): the text encoding of the file.
+
+    Returns:
+        string produced by slicing the lines of the file and joining them, or
+        None if *outfile* is given.
+
+    Notes:
+        this is equivalent to ``index_join(open(file).readlines(), ...)``,
+        however the file is memory-mapped and searched for the *start* and
+        *stop* lines (which may include the trailing newline), so only the
+        slice is read into memory. If *outfile* is given, the slice is copied
+        to *outfile* in chunks, and is not read into memory. *outfile* may
+        also be a file object opened in binary mode. Lines are separated by
+        ``'\\n'``, and line endings are not translated.
+    '''
+    import locale
+    if step < 1:
+        raise ValueError("step must be a positive integer")
+    encoding = encoding or locale.getpreferredencoding(False)
+    with open(file, 'rb') as input:
+        size = os.fstat(input.fileno()).st_size
+        if size:
+            import mmap
+            data = mmap.mmap(input.fileno(), 0, access=mmap.ACCESS_READ)
+        else: data = b''
+        try:
+            chunks = _index_chunks(data, start.encode(encoding),
+                                   stop.encode(encoding), step, sequential,
+                                   inclusive)
+            if outfile is None:
+                return b''.join(chunks).decode(encoding)
+            if not hasattr(outfile, 'write'):
+                with open(outfile, 'wb') as output:
+                    for chunk in chunks: output.write(chunk)
+            else:
+                for chunk in chunks: outfile.write(chunk)
+        finally:
+            if size: data.close()
+    return
+
+def _find_line(data, line, pos=0):
+    '''get the offset of the first *line* in data, at or after offset *pos*
+
+    Args:
+        data (bytes): bytes (or a mmap) of lines, separated by ``b'\\n'``.
+        line (bytes): the line to find, without the trailing newline.
+        pos (int, default=0): offset of the start of a line in data.
+
+    Returns:
+        int offset of the start of the line, or -1 if the line is not found.
+    '''
+    size = len(data); n = len(line)
+    if pos < size and data[pos:pos+n] == line and \
+       (pos + n == size or data[pos+n:pos+n+1] == b'\n'):
+        return pos
+    while True:
+        pos = data.find(b'\n' + line, pos)
+        if pos < 0 or pos + 1 == size:
+            return -1
+        end = pos + 1 + n
+        if end == size or data[end:end+1] == b'\n':
+            return pos + 1
+        pos += 1
+
+def _index_chunks(data, start, stop, step=1, sequential=True, inclusive=True):
+    '''yield the chunks of data in the slice of lines, as in ``index_join``'''
+    if start.endswith(b'\n'): start = start[:-1]
+    if stop.endswith(b'\n'): stop = stop[:-1]
+    begin = _find_line(data, start)
+    if begin < 0: begin = 0
+    end = _find_line(data, stop, 0 if sequential else begin)
+    if end < 0:
+        end = len(data)
+    elif inclusive:
+        end = data.find(b'\n', end) + 1 or len(data)
+    if step == 1:
+        for i in range(begin, end, CHUNKSIZE):
+            yield data[i:min(i + CHUNKSIZE, end)]
+        return
+    count = 0
+    while begin < end:
+        next = data.find(b'\n', begin, end) + 1 or end
+        if not count % step:
+            yield data[begin:next]
+        begin = next; count += 1
+    return
+
+class SequenceIndex(object):
+    '''an index of the positions of each element in a sequence
+
+    Args:
+        sequence (list): an ordered sequence of (hashable) elements.
+
+    Notes:
+        The index is built once, in a single pass over the sequence, and then
+        the positions of *start* and *stop* in ``index_slice`` (and in
+        ``index_join``) are found with a lookup and a binary search, instead
+        of a scan of the sequence. The sequence should not be modified after
+        the index is built.
+
+    Examples:
+        >>> lines = open('build.log').readlines()
+        >>> index = SequenceIndex(lines)
+        >>> index_join(index, 'BEGIN TEST\\n', 'END TEST\\n')
+        'BEGIN TEST\\n...END TEST\\n'
+    '''
+    def __init__(self, sequence):
+        self.sequence = sequence
+        positions = {} # {element: [indices]}
+        for (i, element) in enumerate(sequence):
+            indices = positions.get(element)
+            if indices is None: positions[element] = [i]
+            else: indices.append(i)
+        self._positions = positions
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def __contains__(self, element):
+        return element in self._positions
+
+    def positions(self, element):
+        '''get the list of indices where the element is in the sequence'''
+        return list(self._positions.get(element, ()))
+
+    def index(self, element, begin=0):
+        '''get the first index of the element, at or after index *begin*
+
+        Args:
+            element (object): an element of the sequence.
+            begin (int, default=0): the index where the search begins.
+
+        Returns:
+            int index of the element in the sequence.
+
+        Notes:
+            a ValueError is raised if the element is not found.
+        '''
+        import bisect
+        indices = self._positions.get(element, ())
+        i = bisect.bisect_left(indices, begin) if begin else 0
+        if i == len(indices):
+            raise ValueError('%r is not in sequence' % (element,))
+        return indices[i]
+
+    def slice(self, start, stop, step=1, sequential=False, inclusive=False):
+        '''get the slice of the sequence, as in ``index_slice``'''
+        try:
+            begin = self.index(start)
+        except ValueError:
+            begin = None
+        if sequential: here = 0
+        else: here = begin or 0
+        try:
+            end = self.index(stop, here)
+        except ValueError:
+            end = None
+        if inclusive and end != None: end += 1
+        return slice(begin,end,step)
+
+    def join(self, start, stop, step=1, sequential=True, inclusive=True):
+        '''slice the sequence, then join the strings, as in ``index_join``'''
+        islice = self.slice(start,stop,step,sequential,inclusive)
+        return ''.join(self.sequence[islice])
+
 #NOTE: broke backward compatibility January 17, 2014
 #      firstval=False --> all=False
-def findpackage(package,root=None,all=False,verbose=True,recurse=True):
+def findpackage(package,root=None,all=False,verbose=True,recurse=True,
+                index=None):
     '''retrieve the path(s) for a package
 
     Args:
@@ -259,6 +924,7 @@ def findpackage(package,root=None,all=False,verbose=True,recurse=True):
         all (bool, defualt=False): if True, return everywhere package is found.
         verbose (bool, default=True): if True, print messages about the search.
         recurse (bool, default=True): if True, recurse down the root directory.
+        index (str, default=None): path to a search index, or True for default.
 
     Returns:
         string path (or list of paths) where package is found.
@@ -267,26 +933,50 @@ def findpackage(package,root=None,all=False,verbose=True,recurse=True):
         On some OS, recursion can be specified by recursion depth (an integer).
         ``findpackage`` will do standard pattern matching for package names,
         attempting to match the head directory of the distribution.
+        If *index* is given, the search uses a persistent index (see ``find``).
+
+        If *root* is not given, and *package* is a module name (e.g. ``'pox'``
+        or ``'pox.tests'``), the package is first looked up with the import
+        system (``importlib.util.find_spec``) and in the ``sys.path`` entries.
+        If found, the location used by ``import`` is returned (or, if all=True,
+        each matching directory on ``sys.path``). Otherwise, the current
+        directory is searched. The results of a search are cached, and reused
+        until one of the searched directories is modified.
     '''
-    if not root: root = os.curdir
+    bldroot = shutils.env('BLD_ROOT',all=False)
+    exproot = shutils.env('EXPORT_ROOT',all=False)
+    def valid(dir): # exclude 'BLD_ROOT' & 'EXPORT_ROOT'
+        return not ((bldroot and bldroot in dir) or (exproot and exproot in dir))
+    if not root:
+        targetdir = [dir for dir in _findmodule(package, all) if valid(dir)]
+        if targetdir:
+            if verbose: print('%s found' % package)
+            return targetdir if all else targetdir[0]
+        root = os.curdir
     if verbose: print('searching %s...' % root)
     if package[0] != os.sep: package = os.sep+package
     packdir,basedir = os.path.split(package)
-    targetdir = shutils.find(basedir,root,recurse=recurse,type='d')
-    #print("targetdir: "+targetdir)
-    #remove invalid candidate directories (and 'BLD_ROOT' & 'EXPORT_ROOT')
-    bldroot = shutils.env('BLD_ROOT',all=False)
-    exproot = shutils.env('EXPORT_ROOT',all=False)
-    remlist = []
-    import fnmatch
-    for dir in targetdir:
-        if (not fnmatch.fnmatch(dir,'*'+package)) or \
-           (not fnmatch.fnmatch(os.path.basename(dir),basedir)) or \
-           ((bldroot) and (bldroot in dir)) or \
-           ((exproot) and (exproot in dir)):
-            remlist.append(dir) #build list of bad matches
-    for dir in remlist:
-        targetdir.remove(dir)
+    key = (package, os.path.abspath(root), recurse, bldroot, exproot)
+    cached = _findpackage_cache.get(key)
+    if cached is not None and _unmodified(cached[1]):
+        targetdir = list(cached[0])
+    else:
+        visited = []
+        targetdir = list(shutils._ifind(root, basedir, recurse, 'd',
+                                        index=index, visited=visited))
+        #print("targetdir: "+targetdir)
+        #remove invalid candidate directories
+        _package = shutils._matcher('*'+package)
+        _basedir = shutils._matcher(basedir)
+        targetdir = [dir for dir in targetdir if _package(dir) and \
+                     _basedir(os.path.basename(dir)) and valid(dir)]
+        # don't trust recently modified directories (in case of later changes)
+        from ._index import RACY_TIME
+        import time
+        now = time.time()
+        if visited and not any(now - mtime * 1e-9 < RACY_TIME \
+                               for (dir, mtime) in visited):
+            _findpackage_cache[key] = (list(targetdir), visited)
     if verbose:
         if targetdir: print('%s found' % package)
         else: print('%s not found' % package)
@@ -294,9 +984,53 @@ def findpackage(package,root=None,all=False,verbose=True,recurse=True):
         return targetdir
     return select(targetdir,counter=os.sep,minimum=True,all=False)
 
+# results of findpackage, as {key: (paths, [(dirname, st_mtime_ns)])}
+_findpackage_cache = {}
+
+def _unmodified(visited):
+    '''check the folders ``[(dirname, st_mtime_ns)]`` have not been modified'''
+    try:
+        return all(os.stat(dir).st_mtime_ns == mtime for (dir, mtime) in visited)
+    except OSError:
+        return False
+
+def _findmodule(package, all=False):
+    '''get the directories of the package, using the import system
+
+    Args:
+        package (str): a module name (e.g. ``'pox.tests'``).
+        all (bool, default=False): if True, get every directory on ``sys.path``.
+
+    Returns:
+        list of absolute string paths of the package, with the location used
+        by ``import`` first. If *package* is not a module name, or the package
+        is not found, an empty list is returned.
+    '''
+    import sys
+    parts = package.split('.')
+    if not package or not min(part.isidentifier() for part in parts):
+        return []
+    paths = []
+    if len(parts) == 1: # importing a submodule would import the parent package
+        import importlib.util
+        try:
+            spec = importlib.util.find_spec(package)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is not None and spec.submodule_search_locations:
+            paths.extend(os.path.abspath(path) for path \
+                         in spec.submodule_search_locations)
+    if all or not paths:
+        for entry in sys.path:
+            if not isinstance(entry, str): continue
+            path = os.path.abspath(os.path.join(entry or os.curdir, *parts))
+            if path not in paths and os.path.isdir(path):
+                paths.append(path)
+    return paths
+
 #NOTE: broke backward compatibility January 18, 2014
 #      minimum=True --> minimum=False
-def select(iterable,counter='',minimum=False,reverse=False,all=True):
+def select(iterable,counter='',minimum=False,reverse=False,all=True,key=None,top=None):
     '''find items in iterable with the max (or min) count of the given counter.
 
     Find the items in an iterable that have the maximum number of *counter*
@@ -309,6 +1043,8 @@ def select(iterable,counter='',minimum=False,reverse=False,all=True):
         minimum (bool, default=False): if True, find min count (else, max).
         reverse (bool, default=False): if True, reverse order of the results.
         all (bool, default=True): if False, only return the first result.
+        key (function, default=None): if given, use ``key(item)`` as the count.
+        top (int, default=None): if given, return the *top* items by count.
 
     Returns:
         list of items in the iterable with the min (or max) count.
@@ -319,27 +1055,44 @@ def select(iterable,counter='',minimum=False,reverse=False,all=True):
         [\'three\', \'seven\']
         >>> select(z, counter=\'e\', minimum=True)
         [\'two\', \'4\', \'six\', \'8\', \'9/81\']
+        >>> select(z, counter=\'e\', top=3)
+        [\'three\', \'seven\', \'zero\']
         >>> 
         >>> y = [[1,2,3],[4,5,6],[1,3,5]]
         >>> select(y, counter=3)
         [[1, 2, 3], [1, 3, 5]]
         >>> select(y, counter=3, minumim=True, all=False)
         [4, 5, 6]
+
+    Notes:
+        if *top* is given, the items are ordered by count (with the max, or
+        min, count first), and *all* is ignored. Items with equal counts are
+        in the order of the iterable (or reverse order, if ``reverse=True``).
+        The iterable is not modified.
+
+        if the iterable is a 1-D NumPy array of strings (or integers), and
+        *key* is not given, the counts are computed with NumPy, and an array
+        is returned.
     '''
-    itype = type(iterable)
-    m = []
-    for item in iterable:
-        try: count = item.count(counter)
-        except TypeError: count = 0  # catches '33'.count(3) --> 0
-        except AttributeError: # catches 33.count(3) --> 0 (or 1)
-            count = 1 if item == counter else 0
-        m.append(count)
+    if key is None and _isarray(iterable) and iterable.ndim == 1:
+        counts = _array_counts(iterable, counter)
+        if counts is not None:
+            return _select_array(iterable, counts, minimum, reverse, all, top)
+    original = iterable
+    if not hasattr(iterable, '__getitem__') or not hasattr(iterable, '__len__'):
+        iterable = list(iterable)
     if reverse:
-        m.reverse()
-        iterable.reverse()
+        iterable = iterable[::-1] if hasattr(iterable, 'count') \
+                   else list(reversed(iterable))
+    m = _counts(iterable, counter, key)
+    if top is not None:
+        import heapq
+        best = heapq.nsmallest if minimum else heapq.nlargest
+        order = best(top, range(len(m)), key=m.__getitem__)
+        return _retype(original, [iterable[i] for i in order])
     if not m:
         if all == True:
-            return itype([])
+            return _retype(original, [])
         else:
             return None
     if minimum:
@@ -347,18 +1100,77 @@ def select(iterable,counter='',minimum=False,reverse=False,all=True):
     else: x = max(m)
     if not all:
         return iterable[m.index(x)]
-    shortlist = []
-    tmp = []
-    for item in iterable: tmp.append(item)
-    occurances = m.count(x)
-    for i in range(occurances):
-        shortlist.append(tmp.pop(m.index(x)))
-        m.pop(m.index(x))
-    return itype(shortlist)
+    return _retype(original, [item for (item, count) in zip(iterable, m) \
+                              if count == x])
+
+def _count(item, counter=''):
+    '''count the occurances of *counter* in item (as used in ``select``)'''
+    try: return item.count(counter)
+    except TypeError: return 0  # catches '33'.count(3) --> 0
+    except AttributeError: # catches 33.count(3) --> 0 (or 1)
+        if _isarray(item): return int((item == counter).sum())
+        return 1 if item == counter else 0
+
+def _counts(iterable, counter='', key=None):
+    '''get a list of the counts for each item in iterable'''
+    if key is not None:
+        return [key(item) for item in iterable]
+    return [_count(item, counter) for item in iterable]
+
+def _retype(iterable, items):
+    '''convert the list of items to the type of the iterable, if possible'''
+    itype = type(iterable)
+    if itype is list: return items
+    if _isarray(iterable): # an array of items, with the same dtype
+        import numpy as np
+        array = np.empty((len(items),) + iterable.shape[1:], iterable.dtype)
+        for (i, item) in enumerate(items): array[i] = item
+        return array
+    try:
+        return itype(items)
+    except Exception:
+        return items
+
+def _isarray(iterable):
+    '''check if iterable is a NumPy array (without importing NumPy)'''
+    return type(iterable).__module__ == 'numpy' and \
+           hasattr(iterable, 'dtype') and hasattr(iterable, 'ndim')
+
+def _array_counts(array, counter=''):
+    '''get an array of counts for a 1-D NumPy array, or None if unsupported'''
+    import numpy as np
+    kind = array.dtype.kind
+    if (kind == 'U' and isinstance(counter, str)) or \
+       (kind == 'S' and isinstance(counter, bytes)):
+        return np.char.count(array, counter)
+    if kind in 'US': # catches b'33'.count('3') --> 0
+        return np.zeros(len(array), dtype=int)
+    if kind in 'iu':
+        if isinstance(counter, (int, np.integer)) and \
+           not isinstance(counter, bool):
+            return (array == counter).astype(int)
+        return np.zeros(len(array), dtype=int)
+    return None
+
+def _select_array(array, counts, minimum=False, reverse=False, all=True,
+                  top=None):
+    '''select items in a 1-D NumPy array, given an array of their counts'''
+    import numpy as np
+    if reverse:
+        array, counts = array[::-1], counts[::-1]
+    if top is not None:
+        order = np.argsort(counts if minimum else -counts, kind='stable')
+        return array[order[:top]]
+    if not len(counts):
+        return array[:0] if all == True else None
+    x = counts.min() if minimum else counts.max()
+    if not all:
+        return array[int(np.argmax(counts == x))]
+    return array[counts == x]
 
 #NOTE: broke backward compatibility January 18, 2014
 #      minimum=True --> minimum=False
-def selectdict(dict,counter='',minimum=False,all=True):
+def selectdict(dict,counter='',minimum=False,all=True,key=None,keys=False):
     '''return a dict of items with the max (or min) count of the given counter.
 
     Get the items from a dict that have the maximum number of the *counter*
@@ -370,6 +1182,8 @@ def selectdict(dict,counter='',minimum=False,all=True):
         counter (str, default=''): the item to count.
         minimum (bool, default=False): if True, find min count (else, max).
         all (bool, default=True): if False, only return the first result.
+        key (function, default=None): if given, use ``key(value)`` as the count.
+        keys (bool, default=False): if True, only return a list of the keys.
 
     Returns:
         dict of items composed of the entries with the min (or max) count.
@@ -387,17 +1201,22 @@ def selectdict(dict,counter='',minimum=False,all=True):
         {1: [1, 2, 3], 3: [1, 3, 5]}
         >>> selectdict(y, counter=3, minumim=True)
         {2: [4, 5, 6]}
+        >>> selectdict(y, counter=3, keys=True)
+        [1, 3]
     '''
-    keys,values = zip(*dict.items())
-    shortlist = select(values,counter,minimum,all=all)
+    values = list(dict.values())
+    m = _counts(values, counter, key)
+    if not m:
+        return [] if keys else {}
+    x = min(m) if minimum else max(m)
     if not all:
-        x = list(values).index(shortlist)
-        return {keys[x]: values[x]}
-    shortdict = {}
-    for i in range(len(values)):
-        if values[i] in shortlist:
-            shortdict.update({keys[i]: values[i]})
-    return shortdict
+        shortlist = [m.index(x)]
+    else:
+        shortlist = [i for (i, count) in enumerate(m) if count == x]
+    names = list(dict)
+    if keys:
+        return [names[i] for i in shortlist]
+    return {names[i]: values[i] for i in shortlist}
 
 #NOTE: broke backward compatibility January 18, 2014
 #      forceSSH --> loopback
@@ -504,11 +1323,164 @@ def which_python(version=False, lazy=False, fullpath=True, ignore_errors=True):
         if not pyversion or tuple(int(i) for i in version) == sysversion:
             target = sys.executable
         else:
-            target = shutils.which(target, ignore_errors=True)
+            target = _which_python(target, version, IS_PYPY)
     if not target: target = None #XXX: better None or "" ?
     return target
 
-def wait_for(path,sleep=1,tries=150,ignore_errors=False):
+def _which_python(target, version, pypy=False):
+    """get the path of the python executable, by name or by version
+
+    Args:
+        target (str): name of the executable (e.g. ``python3.11``).
+        version (list(str)): the version numbers (e.g. ``['3', '11']``).
+        pypy (bool, default=False): if True, find a pypy executable.
+
+    Returns:
+        string path of the first executable on the search path named *target*,
+        or else, the first with the requested implementation and version. If
+        no executable is found, return None.
+    """
+    for path in _python_paths():
+        name = os.path.basename(path)
+        if name == target or os.path.splitext(name)[0] == target:
+            return path
+    try:
+        version = tuple(int(i) for i in version)
+    except ValueError:
+        return None
+    for (path, (implementation, _version)) in pythons().items():
+        if (implementation == 'PyPy') == pypy and \
+           _version[:len(version)] == version:
+            return path
+    return None
+
+def pythons(refresh=False, workers=None):
+    """get the python (and pypy) executables found on the user's path
+
+    Args:
+        refresh (bool, default=False): if True, ignore the cached versions.
+        workers (int, default=None): max number of executables probed at once.
+
+    Returns:
+        dict of ``{path: (implementation, version)}``, in search path order,
+        where *version* is a tuple of ints (e.g. ``('CPython', (3, 11, 7))``).
+
+    Notes:
+        the search path (``$PATH``) is scanned for executables named like
+        ``python``, ``python3``, ``python3.11``, or ``pypy3``, and each one
+        is run to get its version. The versions are cached on disk (in
+        ``~/.cache/pox/pythons.json``, see ``pox._index.cachedir``), keyed by
+        the path and modification time of the executable, so an executable is
+        only run again when it changes. Executables that fail to report a
+        version are not included.
+    """
+    paths = _python_paths()
+    import json
+    from ._index import cachedir
+    filename = os.path.join(cachedir(), 'pythons.json')
+    try:
+        with open(filename) as file:
+            cache = {} if refresh else json.load(file)
+    except (OSError, ValueError):
+        cache = {}
+    found = {} # {realpath: mtime}
+    for path in paths:
+        try:
+            real = os.path.realpath(path)
+            found[real] = os.stat(real).st_mtime_ns
+        except OSError:
+            continue
+    probe = [real for (real, mtime) in found.items() \
+             if real not in cache or cache[real][0] != mtime]
+    if probe:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers or min(8, len(probe))) as pool:
+            for (real, result) in zip(probe, pool.map(_probe_python, probe)):
+                cache[real] = [found[real]] + (list(result) if result else [None, None])
+        try:
+            import tempfile
+            os.makedirs(cachedir(), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=cachedir(), prefix='.pythons')
+            with os.fdopen(fd, 'w') as file:
+                json.dump(cache, file)
+            os.replace(tmp, filename)
+        except OSError:
+            pass
+    registry = {}
+    for path in paths:
+        entry = cache.get(os.path.realpath(path))
+        if entry and entry[1]:
+            registry[path] = (entry[1], tuple(entry[2]))
+    return registry
+
+def _probe_python(path):
+    """get ``(implementation, version)`` of the python executable, or None"""
+    import subprocess
+    script = 'import platform, sys; ' \
+             'print(platform.python_implementation(), *sys.version_info[:3])'
+    try:
+        output = subprocess.run([path, '-c', script], capture_output=True,
+                                stdin=subprocess.DEVNULL, timeout=30,
+                                text=True).stdout.split()
+        return output[0], tuple(int(i) for i in output[1:4])
+    except (OSError, ValueError, IndexError, subprocess.SubprocessError):
+        return None
+
+# name of python executables, as in python3.11 (with an optional '.exe')
+_python_name = None
+
+# python executables on the search path, as {key: (mtimes, paths)}
+_python_paths_cache = {}
+
+def _python_paths(path=None):
+    """get a list of the python executables on the search path
+
+    Args:
+        path (str, default=None): search path [default: ``$PATH``].
+
+    Returns:
+        list of string paths, in search path order.
+
+    Notes:
+        results are cached by the search path, and are reused until the
+        modification time of one of the directories on the path changes.
+    """
+    global _python_name
+    if not _python_name:
+        import re
+        _python_name = re.compile(r'(python|pypy)-?[0-9.]*(\.exe)?$', re.I)
+    if path is None: path = os.environ.get('PATH', os.defpath)
+    dirs = [d or os.curdir for d in shutils.minpath(path).split(os.pathsep)]
+    # relative directories depend on the current directory
+    cwd = None if min([os.path.isabs(d) for d in dirs] or [True]) \
+          else os.getcwd()
+    mtimes = []
+    for _dir in dirs:
+        try:
+            mtimes.append(os.stat(_dir).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    key = (path, cwd)
+    cached = _python_paths_cache.get(key)
+    if cached is not None and cached[0] == mtimes:
+        return list(cached[1])
+    paths = []
+    for _dir, mtime in zip(dirs, mtimes):
+        if mtime is None: continue
+        try:
+            with os.scandir(_dir) as it:
+                names = sorted(entry.name for entry in it \
+                               if _python_name.match(entry.name))
+        except OSError:
+            continue
+        for name in names:
+            candidate = os.path.join(_dir, name)
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                paths.append(candidate)
+    _python_paths_cache[key] = (mtimes, paths)
+    return list(paths)
+
+def wait_for(path,sleep=1,tries=150,ignore_errors=False,watch=True):
     """block execution by waiting for a file to appear at the given path
         
     Args:
@@ -516,6 +1488,7 @@ def wait_for(path,sleep=1,tries=150,ignore_errors=False):
         sleep (float, default=1): the time between checking results.
         tries (int, default=150): the number of times to try.
         ignore_errors (bool, default=False): if True, ignore timeout error.
+        watch (bool, default=True): if True, watch for filesystem events.
 
     Returns:
         None
@@ -524,26 +1497,144 @@ def wait_for(path,sleep=1,tries=150,ignore_errors=False):
         if the file is not found after the given number of tries, an error
         will be thrown unless ``ignore_error=True``.
 
+        if ``watch=True`` and inotify is available (i.e. on Linux), events in
+        the parent directory are watched, and thus ``wait_for`` returns as soon
+        as the file appears. Otherwise, the path is checked with exponential
+        backoff (see ``iwait_for``). The timeout is ``sleep * tries`` seconds.
+
         using ``subproc = Popen(...)`` and ``subproc.wait()`` is usually
         a better approach. However, when a handle to the subprocess is
         unavailable, waiting for a file to appear at a given path is a
         decent last resort.
     """
-    from subprocess import call
-    maxcount = int(tries); counter = 0
-    sync = shutils.which('sync', all=False)
-    while not os.path.exists(path):
-        if sync: call('sync', shell=True)
-        import time
-        # wait for results
-        time.sleep(sleep); counter += 1  
-        if counter >= maxcount:
-            if not ignore_errors:
-                raise IOError("%s not found" % path)
-            print("Warning: exceeded timeout (%s tries)" % maxcount)
-            break
+    for path in iwait_for([path],1,sleep,tries,ignore_errors,watch):
+        pass
     return
 
+def wait_for_all(paths,count=None,sleep=1,tries=150,ignore_errors=False,
+                 watch=True):
+    """block execution by waiting for files to appear at the given paths
+
+    Args:
+        paths (list(str)): path strings to watch, or a glob pattern string.
+        count (int, default=None): the number of files to wait for.
+        sleep (float, default=1): the longest time between checking results.
+        tries (int, default=150): the number of times to try.
+        ignore_errors (bool, default=False): if True, ignore timeout error.
+        watch (bool, default=True): if True, watch for filesystem events.
+
+    Returns:
+        list of paths, in the order that the files appeared.
+
+    Notes:
+        waits for all of the given paths, or for *count* of them. If *paths*
+        is a glob pattern (e.g. ``'results/*.out'``), waits for *count*
+        files matching the pattern [default: 1]. See ``iwait_for`` for details.
+    """
+    return list(iwait_for(paths,count,sleep,tries,ignore_errors,watch))
+
+def iwait_for(paths,count=None,sleep=1,tries=150,ignore_errors=False,
+              watch=True):
+    """generate paths as files appear at the given paths
+
+    Args:
+        paths (list(str)): path strings to watch, or a glob pattern string.
+        count (int, default=None): the number of files to wait for.
+        sleep (float, default=1): the longest time between checking results.
+        tries (int, default=150): the number of times to try.
+        ignore_errors (bool, default=False): if True, ignore timeout error.
+        watch (bool, default=True): if True, watch for filesystem events.
+
+    Returns:
+        a generator of paths, in the order that the files appear.
+
+    Notes:
+        waits for all of the given paths, or for *count* of them. If *paths*
+        is a glob pattern (e.g. ``'results/*.out'``), waits for *count*
+        files matching the pattern [default: 1]. All paths share a single
+        timeout of ``sleep * tries`` seconds, after which an error will be
+        thrown unless ``ignore_error=True``.
+
+        if ``watch=True`` and inotify is available (i.e. on Linux), events in
+        the parent directories are watched, and thus each path is produced as
+        soon as the file appears. Otherwise, the paths are checked with
+        exponential backoff, starting at 10 ms, with *sleep* as the longest
+        interval. The paths are always checked at least once every *sleep*
+        seconds, as files created on a remote host (e.g. on NFS) do not
+        produce an event.
+    """
+    import glob
+    import time
+    from ._watch import watcher
+    if isinstance(paths, str):
+        pattern = paths; pending = {}
+        if count is None: count = 1
+    else:
+        pattern = None
+        pending = dict((os.path.abspath(path),path) for path in paths)
+        if count is None: count = len(pending)
+    maxcount = int(tries)
+    deadline = time.time() + sleep * maxcount
+    seen = set(); watched = set(); ready = 0
+    inotify = watcher() if watch else None
+    try:
+        delay = min(0.01, sleep); events = None; swept = 0
+        while ready < count:
+            # check for new files (only where there were events, if known,
+            # and since the last check of all paths is less than sleep ago)
+            if pattern is not None:
+                new = [p for p in sorted(glob.glob(pattern)) if p not in seen]
+            elif events is None or time.time() - swept >= sleep:
+                swept = time.time()
+                new = [p for p in pending.values() if os.path.exists(p)]
+            else:
+                new = [pending[p] for p in events \
+                       if p in pending and os.path.exists(pending[p])]
+            for path in new:
+                seen.add(path); pending.pop(os.path.abspath(path),None)
+                ready += 1
+                yield path
+                if ready >= count: return
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                if not ignore_errors:
+                    if pattern is None:
+                        missing = ', '.join(pending.values())
+                        raise IOError("%s not found" % missing)
+                    raise IOError("%s of %s files matching %s not found" % \
+                                  (count - ready, count, pattern))
+                print("Warning: exceeded timeout (%s tries)" % maxcount)
+                return
+            # watch the parent directories, once they exist
+            if inotify:
+                if pattern is None:
+                    parents = set(os.path.dirname(p) for p in pending)
+                else:
+                    parent = os.path.dirname(os.path.abspath(pattern))
+                    parents = set(glob.glob(parent)) \
+                              if glob.has_magic(parent) else set([parent])
+                added = False
+                for parent in parents - watched:
+                    if not os.path.isdir(parent): continue
+                    try:
+                        inotify.add(parent)
+                    except OSError: # e.g. too many watches, so just poll
+                        break
+                    watched.add(parent); added = True
+                if added: # check again, as files may have just appeared
+                    events = None
+                    continue
+            # wait for results
+            if watched:
+                found = inotify.wait(min(delay, remaining))
+                if not found or (None,None) in found: events = None
+                else: events = set(os.path.join(*item) for item in found)
+            else:
+                time.sleep(min(delay, remaining))
+            delay = min(2 * delay, sleep)
+    finally:
+        if inotify: inotify.close()
+    return
 
 # backward compatability
 makefilter = pattern